@@ -0,0 +1,33 @@
+import argparse
+import json
+import sys
+from .pipeline import DEFAULT_SIZES, compare, format_comparison, run_suite
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='parse → layout → render → export benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='node counts of the synthetic maps')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage (the median is kept)')
+    parser.add_argument('--layout', choices=['radial', 'balanced', 'tidy', 'classic'], default='radial')
+    parser.add_argument('--save', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.sizes, args.repeat, args.layout)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows, regressions = compare(report, baseline, args.threshold)
+        print(format_comparison(rows))
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.compare}", file=sys.stderr)
+            return 1
+    return 0
+
+sys.exit(main())
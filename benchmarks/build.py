@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication
+
+from mindmap.backends import synthetic_tree
+from mindmap.scene import MindMapScene
+from mindmap.tree import MindMapTree
+from .pipeline import metadata
+
+# بناء المشهد من JSON: كل العقد كعناصر، والوضع الافتراضي، ثم إنشاء كل العناصر في الوضع الافتراضي كما في عرض الخريطة كاملة
+CASES = ('full', 'virtual', 'virtual_overview')
+
+def build_full(scene, data):
+    tree = MindMapTree.from_json(data)
+    scene.apply_layout(tree)
+    scene.load_tree(tree, virtual=False)
+
+def build_virtual(scene, data):
+    scene.create_from_json(data)
+
+def build_virtual_overview(scene, data):
+    scene.create_from_json(data)
+    scene.refresh_viewport(scene.map_bounds())
+
+BUILDERS = {'full': build_full, 'virtual': build_virtual, 'virtual_overview': build_virtual_overview}
+
+def measure(nodes, repeat, layout):
+    data = synthetic_tree(nodes=nodes, depth=4, fan_out=40, seed=0)
+    scene = MindMapScene()
+    scene.layout_mode = layout
+    results = {}
+    for case in CASES:
+        runs = []
+        for _ in range(repeat):
+            scene.clear()
+            start = time.perf_counter()
+            BUILDERS[case](scene, data)
+            runs.append(time.perf_counter() - start)
+        results[case] = {'median': statistics.median(runs), 'min': min(runs),
+                         'items': len(scene.items())}
+    results['nodes'] = len(scene.tree)
+    scene.clear()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.build',
+                                     description='scene construction time from a parsed mind map')
+    parser.add_argument('--nodes', type=int, default=20000, help='nodes in the synthetic map')
+    parser.add_argument('--repeat', type=int, default=5, help='builds per case (the median is kept)')
+    parser.add_argument('--layout', choices=['radial', 'balanced', 'tidy', 'classic'], default='radial')
+    parser.add_argument('--save', help='write the results as JSON')
+    parser.add_argument('--before', help='results JSON from an earlier commit, kept under "before" and compared')
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    report = {'meta': metadata(args.layout, args.repeat), 'nodes': args.nodes, 'layout': args.layout,
+              'results': measure(args.nodes, args.repeat, args.layout)}
+    results = report['results']
+    print(f"{results['nodes']} nodes, {args.layout} layout")
+    for case in CASES:
+        print(f"{case:<18} {results[case]['median'] * 1000:9.1f}ms  ({results[case]['items']} items)")
+    if args.before:
+        with open(args.before, encoding='utf-8') as f:
+            before = json.load(f)
+        # القياس السابق يُحفظ مع الحالي حتى يمكن التحقق من الفرق لاحقاً
+        report['before'] = {'meta': before.get('meta'), 'results': before['results']}
+        for case in CASES:
+            previous = before['results'][case]['median']
+            current = results[case]['median']
+            print(f"{case:<18} {previous * 1000:9.1f}ms -> {current * 1000:9.1f}ms "
+                  f"{previous / current if current else float('inf'):5.2f}x faster")
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QPointF, QSize, QT_VERSION_STR, PYQT_VERSION_STR
+from PyQt5.QtGui import QImage, QPainter
+import numpy as np
+
+from mindmap.backends import synthetic_tree
+from mindmap.export import export_bounds, export_png
+from mindmap.json_parser import JSONParser
+from mindmap.scene import MindMapScene
+from mindmap.window import MindMapView
+
+# مراحل المسار بالترتيب: تحليل الرد ← بناء المشهد والتخطيط ← التحسين ← الخطوط ← السحب ← الرسم ← التصدير
+STAGES = ('parse', 'create_from_json', 'optimize_layout', 'update_all_connections',
+          'drag', 'paint', 'paint_overview', 'export')
+
+DEFAULT_SIZES = (10, 100, 1000, 10000, 100000)
+VIEWPORT = QSize(1280, 800)
+DRAG_STEPS = 60
+# أكبر ضلع لصورة التصدير، فالخرائط الكبيرة بمقياس 1:1 تتجاوز ملايين البكسلات
+EXPORT_MAX_SIDE = 4096
+
+
+def shapes(nodes):
+    # شكل عريض قليل العمق وشكل عميق قليل التفرع لكل حجم
+    wide_fan = max(2, math.ceil(nodes ** (1 / 3)) * 2)
+    return (
+        ('wide', 3, wide_fan),
+        ('deep', 12, 4),
+    )
+
+
+def timed(function, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+    return {'median': statistics.median(runs), 'min': min(runs), 'runs': runs}
+
+
+class PipelineCase:
+    def __init__(self, nodes, shape, depth, fan_out, layout='radial', seed=0):
+        self.name = f"{shape}-{nodes}"
+        self.data = synthetic_tree(nodes=nodes, depth=depth, fan_out=fan_out, seed=seed)
+        self.response = "```json\n" + json.dumps(self.data, ensure_ascii=False) + "\n```"
+        self.layout = layout
+        self.scene = MindMapScene()
+        self.scene.layout_mode = layout
+        self.view = None
+
+    def parse(self):
+        JSONParser.extract_json_from_response(self.response)
+
+    def create_from_json(self):
+        self.scene.create_from_json(self.data)
+
+    def optimize_layout(self):
+        self.scene.optimize_layout()
+
+    def update_all_connections(self):
+        self.scene.update_all_connections()
+
+    def drag(self):
+        # سحب فرع رئيسي خطوة لكل إطار مع تفريغ تحديثات الخطوط كما يفعل المؤقت
+        scene = self.scene
+        branches = scene.tree.children(0)
+        node = scene.nodes[branches[0]] if branches else scene.root_node
+        start = node.pos()
+        for step in range(DRAG_STEPS):
+            node.setPos(start + QPointF(step * 3, step * 2))
+            scene.flush_connection_updates()
+        node.setPos(start)
+        scene.flush_connection_updates()
+
+    def ensure_view(self):
+        if self.view is None:
+            self.view = MindMapView(self.scene)
+            self.view.resize(VIEWPORT)
+        return self.view
+
+    def paint_view(self):
+        view = self.ensure_view()
+        image = QImage(view.viewport().size(), QImage.Format_ARGB32_Premultiplied)
+        painter = QPainter(image)
+        view.render(painter)
+        painter.end()
+
+    def paint(self):
+        # رسم عرض كامل بالتكبير الافتراضي حول المركز
+        view = self.ensure_view()
+        view.centerOn(0, 0)
+        self.paint_view()
+
+    def paint_overview(self):
+        # رسم الخريطة كاملة في العرض، حيث تعمل مستويات التفاصيل
+        view = self.ensure_view()
+        view.fitInView(self.scene.map_bounds())
+        self.paint_view()
+        view.resetTransform()
+        view.scale(0.8, 0.8)
+
+    def export(self):
+        rect = export_bounds(self.scene)
+        scale = min(1.0, EXPORT_MAX_SIDE / max(rect.width(), rect.height(), 1))
+        with tempfile.TemporaryDirectory() as directory:
+            export_png(self.scene, str(Path(directory) / 'map.png'), scale=scale)
+
+    def run(self, repeat):
+        results = {}
+        for stage in STAGES:
+            results[stage] = timed(getattr(self, stage), repeat)
+        results['nodes'] = len(self.scene.tree)
+        return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(layout, repeat):
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'qt': QT_VERSION_STR,
+        'pyqt': PYQT_VERSION_STR,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'qpa': os.environ.get('QT_QPA_PLATFORM'),
+        'layout': layout,
+        'repeat': repeat,
+    }
+
+
+def run_suite(sizes=DEFAULT_SIZES, repeat=3, layout='radial', log=sys.stderr):
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    report = {'meta': metadata(layout, repeat), 'results': {}}
+    for nodes in sizes:
+        for shape, depth, fan_out in shapes(nodes):
+            case = PipelineCase(nodes, shape, depth, fan_out, layout)
+            results = case.run(repeat)
+            report['results'][case.name] = results
+            print(f"{case.name} ({results['nodes']} nodes): " + ', '.join(
+                f"{stage} {results[stage]['median'] * 1000:.1f}ms" for stage in STAGES), file=log)
+            case.scene.clear()
+    return report
+
+
+def compare(report, baseline, threshold=1.25, floor=0.005):
+    # تراجع = وسيط أبطأ من الأساس بأكثر من النسبة وبفرق مطلق يتجاوز ضجيج القياس
+    regressions = []
+    rows = []
+    for name, results in report['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        for stage in STAGES:
+            if stage not in results or stage not in base:
+                continue
+            current = results[stage]['median']
+            previous = base[stage]['median']
+            ratio = current / previous if previous else float('inf')
+            regressed = ratio > threshold and current - previous > floor
+            rows.append((name, stage, previous, current, ratio, regressed))
+            if regressed:
+                regressions.append((name, stage, previous, current, ratio))
+    return rows, regressions
+
+
+def format_comparison(rows):
+    lines = [f"{'case':<14} {'stage':<24} {'baseline':>10} {'current':>10} {'ratio':>7}"]
+    for name, stage, previous, current, ratio, regressed in rows:
+        mark = '  REGRESSION' if regressed else ''
+        lines.append(f"{name:<14} {stage:<24} {previous * 1000:>8.1f}ms {current * 1000:>8.1f}ms "
+                     f"{ratio:>6.2f}x{mark}")
+    return '\n'.join(lines)
@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# يعمل في عملية جديدة لكل قياس حتى تُحسب كلفة الاستيراد كاملة
+CHILD = r'''
+import json, sys, time
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QObject, QEvent, QTimer
+app = QApplication(sys.argv[:1])
+qt = time.perf_counter()
+import mindmap
+imported = time.perf_counter()
+from mindmap import MindMapWindow
+window = MindMapWindow()
+constructed = time.perf_counter()
+marks = {}
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and 'paint' not in marks:
+            marks['paint'] = time.perf_counter()
+            marks['wall'] = time.time()
+            marks['sdk'] = 'google.generativeai' in sys.modules
+            QTimer.singleShot(0, app.quit)
+        return False
+
+first_paint = FirstPaint()
+window.view.viewport().installEventFilter(first_paint)
+window.show()
+app.exec_()
+print(json.dumps({
+    'qt_init': qt - start,
+    'import_mindmap': imported - qt,
+    'construct_window': constructed - imported,
+    'show_to_paint': marks['paint'] - constructed,
+    'in_process_to_paint': marks['paint'] - start,
+    'paint_wall': marks['wall'],
+    'sdk_loaded_at_paint': marks['sdk'],
+}))
+'''
+
+STAGES = ('qt_init', 'import_mindmap', 'construct_window', 'show_to_paint', 'time_to_first_paint')
+
+def measure_once(root):
+    # HOME مؤقت حتى لا تظهر نافذة الاستعادة ولا تُلمس إعدادات المستخدم
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home, PYTHONPATH=str(root))
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        spawned = time.time()
+        result = subprocess.run([sys.executable, '-c', CHILD], capture_output=True, text=True,
+                                env=env, cwd=str(root), check=True)
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    # من تشغيل المفسر حتى أول رسم للعرض
+    sample['time_to_first_paint'] = sample.pop('paint_wall') - spawned
+    return sample
+
+def run(repeat=5, root=None):
+    root = Path(root or Path(__file__).resolve().parent.parent)
+    samples = [measure_once(root) for _ in range(repeat)]
+    results = {stage: {'median': statistics.median(sample[stage] for sample in samples),
+                       'min': min(sample[stage] for sample in samples)} for stage in STAGES}
+    results['sdk_loaded_at_paint'] = any(sample['sdk_loaded_at_paint'] for sample in samples)
+    return {'repeat': repeat, 'results': results}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup',
+                                     description='time from process start to the first painted frame')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh processes to measure (the median is kept)')
+    parser.add_argument('--save', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    report = run(args.repeat)
+    for stage in STAGES:
+        print(f"{stage:<22} {report['results'][stage]['median'] * 1000:8.1f}ms")
+    print(f"{'sdk_loaded_at_paint':<22} {report['results']['sdk_loaded_at_paint']}")
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = 0
+        for stage in STAGES:
+            previous = baseline[stage]['median']
+            current = report['results'][stage]['median']
+            ratio = current / previous if previous else float('inf')
+            # فرق 5ms على الأقل حتى لا يُعد ضجيج القياس تراجعاً
+            regressed = ratio > args.threshold and current - previous > 0.005
+            regressions += regressed
+            print(f"{stage:<22} {previous * 1000:8.1f}ms -> {current * 1000:8.1f}ms {ratio:5.2f}x"
+                  + ('  REGRESSION' if regressed else ''))
+        if regressions:
+            print(f"{regressions} regression(s) against {args.compare}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
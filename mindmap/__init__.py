@@ -1,7 +1,26 @@
-from .window import MindMapWindow
-from .scene import MindMapScene
-from .models import Node, Connection
-from .chat_widget import ChatWidget
-from .ai_chat import AIChat
+import importlib
 
-__version__ = '1.0.0'
\ No newline at end of file
+__version__ = '1.0.0'
+
+# الأصناف تُستورد عند أول استخدام، فاستيراد الحزمة لا يحمّل Qt ولا مكتبة النموذج
+_EXPORTS = {
+    'MindMapWindow': '.window',
+    'MindMapScene': '.scene',
+    'Node': '.models',
+    'Connection': '.models',
+    'ChatWidget': '.chat_widget',
+    'AIChat': '.ai_chat',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
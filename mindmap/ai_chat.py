@@ -1,34 +1,90 @@
-import google.generativeai as genai
+import threading
+from collections import deque
 from .config import load_api_key
+from .cache import ResponseCache
+from .backends import create_backend, estimate_tokens
+from .json_parser import JSONParser
+from .request_layer import RequestLayer
+from .profiler import profiler, traced
+
+# يجب زيادته عند تغيير نص الطلب حتى لا تُستخدم نتائج قديمة من الذاكرة المؤقتة
+PROMPT_VERSION = 1
+
+class ConversationContext:
+    # نافذة سياق محدودة بعدد الرموز لوضع التحسين
+    def __init__(self, max_tokens=8000):
+        self.max_tokens = max_tokens
+        self.turns = deque()
+        self.tokens = 0
+
+    def contents(self, prompt):
+        contents = [{'role': role, 'parts': [text]} for role, text, _ in self.turns]
+        contents.append({'role': 'user', 'parts': [prompt]})
+        return contents
+
+    def add_exchange(self, prompt, prompt_tokens, response, response_tokens):
+        self.turns.append(('user', prompt, prompt_tokens))
+        self.turns.append(('model', response, response_tokens))
+        self.tokens += prompt_tokens + response_tokens
+
+        # حذف أقدم تبادل كامل حتى نعود ضمن الحد
+        while self.tokens > self.max_tokens and len(self.turns) > 2:
+            for _ in range(2):
+                self.tokens -= self.turns.popleft()[2]
+
+    def clear(self):
+        self.turns.clear()
+        self.tokens = 0
 
 class AIChat:
-    def __init__(self):
+    def __init__(self, backend=None, refine=False, max_context_tokens=8000, requests=None):
         self.api_key = load_api_key()
-        self.setup_model()
+        self.backend = backend or create_backend()
+        # المهلة والإعادة ودمج الطلبات المتطابقة الجارية
+        self.requests = requests or RequestLayer()
+        self.cache = ResponseCache()
+        # الطلبات مستقلة افتراضياً، ووضع التحسين يحتفظ بسياق محدود
+        self.refine = refine
+        self.context = ConversationContext(max_context_tokens)
+        self.last_usage = {'prompt_tokens': 0, 'response_tokens': 0}
+        self.total_prompt_tokens = 0
+        self.total_response_tokens = 0
+        self._usage_lock = threading.Lock()
+        # نتائج توسيع الفروع حسب المسار من المركز
+        self._expansions = {}
+        self._expansion_lock = threading.Lock()
+        # تهيئة النموذج مؤجلة إلى أول طلب، لأن استيراد مكتبته بطيء
+        self._model_ready = False
+        self._model_lock = threading.Lock()
 
     def setup_model(self):
-        genai.configure(api_key=self.api_key)
-        generation_config = {
-            "temperature": 0.7,
-            "top_p": 1,
-            "top_k": 1,
-            "max_output_tokens": 2048,
-        }
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-        ]
-        self.model = genai.GenerativeModel(
-            model_name="gemini-2.0-flash",
-            generation_config=generation_config,
-            safety_settings=safety_settings
-        )
-        self.chat = self.model.start_chat(history=[])
-
-    def generate_mindmap(self, topic):
-        prompt = f"""Create a detailed mind map structure for the topic: {topic}
+        self.backend.configure(self.api_key)
+        self._model_ready = True
+
+    def ensure_model(self):
+        # تُستدعى من خيوط الطلبات أو من خيط التحميل المسبق بعد ظهور النافذة
+        with self._model_lock:
+            if not self._model_ready:
+                self.setup_model()
+
+    def set_api_key(self, api_key):
+        # المفتاح الجديد يُستخدم عند الطلب التالي
+        with self._model_lock:
+            self.api_key = api_key
+            self._model_ready = False
+
+    @property
+    def model_name(self):
+        return self.backend.model_name
+
+    @property
+    def generation_config(self):
+        return self.backend.generation_config
+
+    def build_prompt(self, topic, outline=False):
+        if outline:
+            return self.build_outline_prompt(topic)
+        return f"""Create a detailed mind map structure for the topic: {topic}
         The response must be in JSON format with the following structure:
         {{
             "center": "main topic",
@@ -44,5 +100,145 @@ class AIChat:
         }}
         Provide the response in a code block with ```json and ``` markers."""
 
-        response = self.chat.send_message(prompt)
-        return response.text
\ No newline at end of file
+    def build_outline_prompt(self, topic):
+        return f"""Create the top level of a mind map for the topic: {topic}
+        Only list the main branches, without sub-topics.
+        The response must be in JSON format with the following structure:
+        {{
+            "center": "main topic",
+            "branches": [
+                {{"text": "branch topic"}}
+            ]
+        }}
+        Provide the response in a code block with ```json and ``` markers."""
+
+    def build_expand_prompt(self, path):
+        trail = " > ".join(path)
+        return f"""In a mind map about "{path[0]}", list the direct sub-topics of the branch: {trail}
+        Only list one level of sub-topics.
+        The response must be in JSON format with the following structure:
+        {{
+            "children": [
+                {{"text": "sub-topic"}}
+            ]
+        }}
+        Provide the response in a code block with ```json and ``` markers."""
+
+    def cache_key(self, topic, kind='full'):
+        version = PROMPT_VERSION if kind == 'full' else f"{PROMPT_VERSION}:{kind}"
+        return ResponseCache.make_key(topic, self.model_name, self.generation_config, version)
+
+    def cached_tree(self, topic, kind='full'):
+        # نتائج وضع التحسين تعتمد على السياق فلا تُخزن
+        if self.refine:
+            return None
+        return self.cache.get(self.cache_key(topic, kind))
+
+    def store_tree(self, topic, data, kind='full'):
+        if not self.refine:
+            self.cache.put(self.cache_key(topic, kind), topic, data)
+
+    def request_contents(self, prompt):
+        if self.refine:
+            return self.context.contents(prompt)
+        return prompt
+
+    def record_usage(self, prompt, text, prompt_tokens, response_tokens):
+        with self._usage_lock:
+            context_tokens = self.context.tokens if self.refine else 0
+            if not prompt_tokens:
+                prompt_tokens = context_tokens + estimate_tokens(prompt)
+            if not response_tokens:
+                response_tokens = estimate_tokens(text)
+
+            self.last_usage = {'prompt_tokens': prompt_tokens, 'response_tokens': response_tokens}
+            self.total_prompt_tokens += prompt_tokens
+            self.total_response_tokens += response_tokens
+            if self.refine:
+                turn_tokens = max(1, prompt_tokens - context_tokens)
+                self.context.add_exchange(prompt, turn_tokens, text, response_tokens)
+
+    def complete(self, prompt, key=None):
+        # الطلبات بالمفتاح نفسه تشترك في طلب واحد، فيُحسب استخدامها مرة واحدة
+        return self.requests.coalesce(key, lambda: self._complete(prompt))
+
+    def _complete(self, prompt):
+        self.ensure_model()
+        contents = self.request_contents(prompt)
+        completion = self.requests.execute(lambda timeout: self.backend.generate(contents, timeout=timeout))
+        self.record_usage(prompt, completion.text, completion.prompt_tokens, completion.response_tokens)
+        return completion.text
+
+    def request_key(self, topic, kind='full'):
+        # نتائج وضع التحسين تعتمد على السياق فلا تُدمج
+        return None if self.refine else self.cache_key(topic, kind)
+
+    def request_metrics(self):
+        return self.requests.metrics()
+
+    @traced('ai.generate_mindmap')
+    def generate_mindmap(self, topic, outline=False):
+        return self.complete(self.build_prompt(topic, outline),
+                             self.request_key(topic, 'outline' if outline else 'full'))
+
+    def generate_tree(self, topic, outline=False, attempts=2):
+        # إعادة الطلب فقط إذا لم يبقَ شيء صالح بعد الإصلاح، فالاستجابة المقطوعة تُستخدم كما هي
+        for attempt in range(attempts):
+            response = self.generate_mindmap(topic, outline)
+            try:
+                data, report = JSONParser.parse_response(response)
+            except ValueError:
+                if attempt == attempts - 1:
+                    raise
+                continue
+            if report.usable:
+                return response, data, report
+        raise ValueError("No usable mind map found in response")
+
+    def has_expansion(self, path):
+        with self._expansion_lock:
+            return tuple(path) in self._expansions
+
+    def expand_branch(self, path):
+        # طلب صغير لأبناء فرع واحد، مع حفظ النتيجة حسب المسار
+        key = tuple(path)
+        with self._expansion_lock:
+            children = self._expansions.get(key)
+        if children is not None:
+            return children
+
+        topic = " > ".join(path)
+        data = self.cached_tree(topic, 'expand')
+        if data is None:
+            response = self.complete(self.build_expand_prompt(path), self.request_key(topic, 'expand'))
+            data = {'children': JSONParser.extract_children(response)}
+            self.store_tree(topic, data, 'expand')
+
+        children = data['children']
+        with self._expansion_lock:
+            self._expansions[key] = children
+        return children
+
+    def stream_mindmap(self, topic, outline=False):
+        # إرجاع أجزاء الاستجابة فور وصولها
+        prompt = self.build_prompt(topic, outline)
+        self.ensure_model()
+        contents = self.request_contents(prompt)
+
+        def first_chunk(timeout):
+            # المهلة والإعادة تشمل انتظار الجزء الأول فقط، فما عُرض بعده لا يمكن إعادته
+            stream = self.backend.stream(contents, timeout=timeout)
+            parts = iter(stream)
+            return stream, parts, next(parts, None)
+
+        chunks = []
+        with profiler.span('ai.stream_mindmap'):
+            # البث لا يُدمج مع طلبات أخرى لأن أجزاءه تُقرأ مرة واحدة
+            stream, parts, first = self.requests.execute(first_chunk)
+            if first is not None:
+                chunks.append(first)
+                yield first
+            for text in parts:
+                chunks.append(text)
+                yield text
+        self.record_usage(prompt, ''.join(chunks), stream.prompt_tokens, stream.response_tokens)
\ No newline at end of file
@@ -0,0 +1,243 @@
+import json
+import os
+import random
+import re
+import time
+
+def estimate_tokens(text):
+    # تقدير تقريبي عند غياب بيانات الاستخدام من الخادم
+    return max(1, len(text) // 4)
+
+class Completion:
+    def __init__(self, text, prompt_tokens=0, response_tokens=0):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.response_tokens = response_tokens
+
+class CompletionStream:
+    # أجزاء الاستجابة، وعدد الرموز متاح بعد انتهاء القراءة
+    def __init__(self):
+        self.chunks = iter(())
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+
+    def __iter__(self):
+        return self.chunks
+
+class LLMBackend:
+    # الواجهة التي يعتمد عليها AIChat لأي نموذج لغوي
+    model_name = ''
+    generation_config = {}
+
+    def configure(self, api_key):
+        pass
+
+    def generate(self, contents, timeout=None):
+        raise NotImplementedError
+
+    def stream(self, contents, timeout=None):
+        raise NotImplementedError
+
+    def count_tokens(self, contents):
+        raise NotImplementedError
+
+class GeminiBackend(LLMBackend):
+    def __init__(self, model_name="gemini-2.0-flash"):
+        self.model_name = model_name
+        self.generation_config = {
+            "temperature": 0.7,
+            "top_p": 1,
+            "top_k": 1,
+            "max_output_tokens": 2048,
+        }
+        self.safety_settings = [
+            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+        ]
+        self.model = None
+
+    def configure(self, api_key):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(
+            model_name=self.model_name,
+            generation_config=self.generation_config,
+            safety_settings=self.safety_settings
+        )
+
+    @staticmethod
+    def _usage(response):
+        usage = getattr(response, 'usage_metadata', None)
+        return (getattr(usage, 'prompt_token_count', 0) or 0,
+                getattr(usage, 'candidates_token_count', 0) or 0)
+
+    def generate(self, contents, timeout=None):
+        # المهلة تُمرر للمكتبة حتى لا يبقى الاتصال معلقاً بعد انتهاء وقت الطلب
+        request_options = {'timeout': timeout} if timeout else None
+        response = self.model.generate_content(contents, request_options=request_options)
+        return Completion(response.text, *self._usage(response))
+
+    def stream(self, contents, timeout=None):
+        result = CompletionStream()
+        request_options = {'timeout': timeout} if timeout else None
+
+        def chunks():
+            response = self.model.generate_content(contents, stream=True, request_options=request_options)
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    continue
+                if text:
+                    yield text
+            result.prompt_tokens, result.response_tokens = self._usage(response)
+
+        result.chunks = chunks()
+        return result
+
+    def count_tokens(self, contents):
+        return self.model.count_tokens(contents).total_tokens
+
+def synthetic_tree(nodes=50, depth=3, fan_out=5, seed=0, label='Topic'):
+    # شجرة اصطناعية حتمية بعدد العقد المطلوب تماماً (مع المركز)، ضمن حدود العمق والتفرع
+    capacity = sum(fan_out ** level for level in range(depth + 1))
+    if nodes > capacity:
+        raise ValueError(f"{nodes} nodes do not fit in depth {depth} with fan-out {fan_out}")
+    rng = random.Random(seed)
+    root = {'center': label, 'branches': []}
+    count = 1
+    frontier = [(root['branches'], label, 1)]
+    # كل قائمة أبناء يمكن أن تكبر: (القائمة، بادئة النص، مستوى أبنائها)
+    parents = list(frontier)
+    while frontier and count < nodes:
+        next_frontier = []
+        for children, prefix, level in frontier:
+            for i in range(rng.randint(1, fan_out)):
+                if count >= nodes:
+                    break
+                count += 1
+                child = _synthetic_child(children, prefix, label, level)
+                if level < depth:
+                    next_frontier.append((child['children'], child['text'] + '.', level + 1))
+        rng.shuffle(next_frontier)
+        parents.extend(next_frontier)
+        frontier = next_frontier
+
+    # الجولة العشوائية تنتهي غالباً قبل العدد المطلوب، فتُكمل العقد في الأماكن الشاغرة
+    open_parents = [parent for parent in parents if len(parent[0]) < fan_out]
+    while count < nodes:
+        slot = rng.randrange(len(open_parents))
+        children, prefix, level = open_parents[slot]
+        count += 1
+        child = _synthetic_child(children, prefix, label, level)
+        if level < depth:
+            open_parents.append((child['children'], child['text'] + '.', level + 1))
+        if len(children) >= fan_out:
+            open_parents[slot] = open_parents[-1]
+            open_parents.pop()
+    _prune_empty(root['branches'])
+    return root
+
+def _synthetic_child(children, prefix, label, level):
+    text = f"{prefix} {len(children) + 1}" if level > 1 else f"{label} {len(children) + 1}"
+    child = {'text': text, 'children': []}
+    children.append(child)
+    return child
+
+def _prune_empty(children):
+    for child in children:
+        if 'children' in child:
+            if child['children']:
+                _prune_empty(child['children'])
+            else:
+                del child['children']
+
+class FakeBackend(LLMBackend):
+    # بديل محلي حتمي لقياس الأداء دون شبكة أو مفتاح
+    def __init__(self, nodes=50, depth=3, fan_out=5, latency=0.0,
+                 chunk_size=64, chunk_delay=0.0, seed=0, failure_rate=0.0):
+        self.model_name = 'fake'
+        self.generation_config = {'nodes': nodes, 'depth': depth, 'fan_out': fan_out, 'seed': seed}
+        self.nodes = nodes
+        self.depth = depth
+        self.fan_out = fan_out
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.seed = seed
+        # نسبة الطلبات التي تفشل بخطأ مؤقت، لاختبار الإعادة
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+
+    def _prompt(self, contents):
+        if isinstance(contents, str):
+            return contents
+        return ''.join(part for content in contents for part in content['parts'])
+
+    def _respond(self, contents):
+        prompt = self._prompt(contents)
+        seed = f"{self.seed}:{prompt}"
+        if '"children"' in prompt and '"center"' not in prompt:
+            tree = self._children(prompt, seed)
+        else:
+            tree = synthetic_tree(self.nodes, self.depth, self.fan_out, seed=seed)
+        return prompt, "```json\n" + json.dumps(tree, ensure_ascii=False) + "\n```"
+
+    def _children(self, prompt, seed):
+        # طلب توسيع فرع: مستوى واحد من الأبناء باسم آخر عنصر في المسار
+        match = re.search(r'sub-topics of the branch: (.+)', prompt)
+        branch = match.group(1).split(' > ')[-1].strip() if match else 'Branch'
+        count = random.Random(seed).randint(1, self.fan_out)
+        return {'children': [{'text': f"{branch} {i + 1}"} for i in range(count)]}
+
+    def generate(self, contents, timeout=None):
+        prompt, text = self._respond(contents)
+        if self.latency:
+            if timeout is not None and timeout < self.latency:
+                time.sleep(timeout)
+                raise TimeoutError("Fake backend timed out")
+            time.sleep(self.latency)
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            raise ConnectionError("Fake backend transient failure")
+        return Completion(text, estimate_tokens(prompt), estimate_tokens(text))
+
+    def stream(self, contents, timeout=None):
+        prompt, text = self._respond(contents)
+        result = CompletionStream()
+        result.prompt_tokens = estimate_tokens(prompt)
+        result.response_tokens = estimate_tokens(text)
+
+        def chunks():
+            # التأخير والفشل المؤقت قبل الجزء الأول، كما في generate
+            if self.latency:
+                if timeout is not None and timeout < self.latency:
+                    time.sleep(timeout)
+                    raise TimeoutError("Fake backend timed out")
+                time.sleep(self.latency)
+            if self.failure_rate and self._rng.random() < self.failure_rate:
+                raise ConnectionError("Fake backend transient failure")
+            for start in range(0, len(text), self.chunk_size):
+                if start and self.chunk_delay:
+                    time.sleep(self.chunk_delay)
+                yield text[start:start + self.chunk_size]
+
+        result.chunks = chunks()
+        return result
+
+    def count_tokens(self, contents):
+        return estimate_tokens(self._prompt(contents))
+
+BACKENDS = {
+    'gemini': GeminiBackend,
+    'fake': FakeBackend,
+}
+
+def create_backend(name=None, **options):
+    # الاختيار عبر المتغير MINDMAP_BACKEND عند عدم تحديد الاسم
+    name = name or os.environ.get('MINDMAP_BACKEND', 'gemini')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name}")
+    return BACKENDS[name](**options)
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from .stats import percentile
+
+def read_topics(source):
+    # قراءة المواضيع من ملف أو من الإدخال القياسي عند استخدام "-"
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(source).read_text(encoding='utf-8').splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.startswith('#')]
+
+def topic_slug(topic):
+    safe = re.sub(r'[^\w]+', '-', topic, flags=re.UNICODE).strip('-')[:60] or 'topic'
+    digest = hashlib.sha1(topic.encode('utf-8')).hexdigest()[:8]
+    return f"{safe}-{digest}"
+
+class RateLimiter:
+    # حد أقصى لعدد الطلبات في الثانية مشترك بين كل العمال
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+        # وقت الانتظار في كل خيط، حتى لا يُحسب ضمن زمن الطلب
+        self._local = threading.local()
+
+    def waited(self):
+        return getattr(self._local, 'waited', 0.0)
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+            self._local.waited = self.waited() + wait
+
+class BatchRunner:
+    def __init__(self, ai_chat, output_dir, concurrency=4, rate=None,
+                 formats=('png',), refresh=False, log=sys.stderr):
+        self.ai_chat = ai_chat
+        self.output_dir = Path(output_dir)
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate)
+        # الحد يُطبق على كل محاولة للنموذج، بما فيها الإعادات والطلبات الاحتياطية
+        ai_chat.requests.limiter = self.limiter
+        self.formats = formats
+        self.refresh = refresh
+        self.log = log
+        self.manifest_path = self.output_dir / 'manifest.jsonl'
+
+    def completed(self):
+        # المواضيع المنجزة في تشغيل سابق، لاستئناف العمل بعد التوقف
+        done = set()
+        if self.manifest_path.exists():
+            with open(self.manifest_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        done.add(json.loads(line)['slug'])
+                    except (ValueError, KeyError):
+                        continue
+        return done
+
+    def generate(self, topic):
+        waited = self.limiter.waited()
+        start = time.perf_counter()
+        data = None if self.refresh else self.ai_chat.cached_tree(topic)
+        cached = data is not None
+        if not cached:
+            response, data, report = self.ai_chat.generate_tree(topic)
+            if report.repaired:
+                print(f"repaired: {topic}: {report.summary()}", file=self.log)
+            self.ai_chat.store_tree(topic, data)
+        # انتظار حد الطلبات ليس من زمن الاستجابة
+        latency = time.perf_counter() - start - (self.limiter.waited() - waited)
+        return data, latency, cached
+
+    def run(self, topics, scene):
+        from .export import EXPORTERS
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        done = self.completed()
+        pending = [(topic_slug(topic), topic) for topic in topics]
+        skipped = sum(1 for slug, _ in pending if slug in done)
+        pending = [(slug, topic) for slug, topic in pending if slug not in done]
+
+        latencies = []
+        failed = 0
+        errors = []
+        cached = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool, \
+                open(self.manifest_path, 'a', encoding='utf-8') as manifest:
+            futures = {pool.submit(self.generate, topic): (slug, topic) for slug, topic in pending}
+            for future in as_completed(futures):
+                slug, topic = futures[future]
+                try:
+                    data, latency, from_cache = future.result()
+                except Exception as e:
+                    failed += 1
+                    errors.append({'topic': topic, 'stage': 'generate', 'error': str(e)})
+                    print(f"failed: {topic}: {e}", file=self.log)
+                    continue
+
+                # شجرة غير صالحة أو تصدير فاشل يُحسب للموضوع وحده ويستمر الباقي
+                stage = 'write'
+                try:
+                    self.write_json(self.output_dir / f"{slug}.json", data)
+                    # الرسم يتم في الخيط الرئيسي لأن المشهد غير آمن للخيوط
+                    stage = 'render'
+                    scene.create_from_json(data)
+                    for fmt in self.formats:
+                        stage = f"export {fmt}"
+                        EXPORTERS[fmt](scene, str(self.output_dir / f"{slug}.{fmt}"))
+                except Exception as e:
+                    failed += 1
+                    errors.append({'topic': topic, 'stage': stage, 'error': str(e)})
+                    print(f"failed: {topic}: {stage}: {e}", file=self.log)
+                    continue
+
+                if from_cache:
+                    cached += 1
+                else:
+                    latencies.append(latency)
+                manifest.write(json.dumps({'slug': slug, 'topic': topic, 'latency': latency,
+                                           'cached': from_cache}, ensure_ascii=False) + '\n')
+                manifest.flush()
+                os.fsync(manifest.fileno())
+                print(f"done: {topic} ({latency:.2f}s)", file=self.log)
+
+        elapsed = time.perf_counter() - started
+        completed = len(pending) - failed
+        return {
+            'completed': completed,
+            'failed': failed,
+            'skipped': skipped,
+            'cached': cached,
+            'elapsed': elapsed,
+            'throughput_per_min': completed / elapsed * 60 if elapsed else 0.0,
+            'latency_p50': percentile(latencies, 50),
+            'latency_p90': percentile(latencies, 90),
+            'latency_p99': percentile(latencies, 99),
+            'requests': self.ai_chat.request_metrics(),
+            'errors': errors,
+        }
+
+    @staticmethod
+    def write_json(path, data):
+        tmp = path.with_suffix('.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
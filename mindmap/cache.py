@@ -0,0 +1,92 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from .config import get_config
+
+def normalize_topic(topic):
+    # توحيد أشكال الحروف والمسافات وحالة الأحرف قبل حساب المفتاح
+    topic = unicodedata.normalize('NFKC', topic)
+    return ' '.join(topic.casefold().split())
+
+class ResponseCache:
+    def __init__(self, path=None, max_entries=500, max_bytes=50 * 1024 * 1024,
+                 ttl=30 * 24 * 3600):
+        self.path = path or get_config().config_dir / 'cache.sqlite3'
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, topic TEXT, data TEXT, size INTEGER, "
+                "created REAL, accessed REAL)")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    @staticmethod
+    def make_key(topic, model_name, generation_config, prompt_version):
+        payload = json.dumps({
+            'topic': normalize_topic(topic),
+            'model': model_name,
+            'config': generation_config,
+            'prompt': prompt_version,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            with self._db:
+                self._db.execute(
+                    "UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, topic, data):
+        text = json.dumps(data, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key, topic, text, len(text.encode('utf-8')), now, now))
+            self._evict(now)
+
+    def _evict(self, now):
+        # حذف المنتهية صلاحيتها ثم الأقدم استخداماً حتى نعود ضمن الحدود
+        self._db.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+        count, total = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        stale = []
+        rows = self._db.execute("SELECT key, size FROM entries ORDER BY accessed ASC")
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            stale.append((key,))
+            count -= 1
+            total -= size
+        self._db.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM entries")
+
+    def stats(self):
+        with self._lock:
+            count, total = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': count, 'bytes': total}
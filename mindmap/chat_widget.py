@@ -1,18 +1,44 @@
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
-from .json_parser import JSONParser
+import threading
 from .ai_chat import AIChat
+from .worker import GenerationWorker, ExpansionWorker, ModelWarmUp
 from .config import save_api_key
 
 class ChatWidget(QWidget):
+    mindMapStarted = pyqtSignal(str)
+    branchGenerated = pyqtSignal(dict)
     mindMapGenerated = pyqtSignal(dict)
+    # توقف التوليد بالإلغاء أو الفشل قبل وصول الخريطة كاملة
+    generationStopped = pyqtSignal()
+    outlineGenerated = pyqtSignal(dict)
+    branchExpanded = pyqtSignal(object, object)
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.ai_chat = AIChat()
+        # يُنشأ عند أول استخدام أو عند التحميل المسبق بعد ظهور النافذة
+        self._ai_chat = None
+        self._ai_chat_lock = threading.Lock()
+        self.thread_pool = QThreadPool.globalInstance()
+        self._worker = None
+        # طلبات التوسيع الجارية، وما طلبه المستخدم منها فعلاً
+        self._expanding = {}
+        self._wanted_expansions = set()
         self.initUI()
         
+    @property
+    def ai_chat(self):
+        # يُنشأ مرة واحدة حتى لو طُلب من الواجهة أثناء إنشائه في خيط التحميل المسبق
+        with self._ai_chat_lock:
+            if self._ai_chat is None:
+                self._ai_chat = AIChat()
+            return self._ai_chat
+
+    def warm_up(self):
+        # إنشاء AIChat (الإعدادات والذاكرة المؤقتة) وتهيئة النموذج في خيط خلفي بأولوية منخفضة
+        self.thread_pool.start(ModelWarmUp(lambda: self.ai_chat), -1)
+
     def initUI(self):
         layout = QVBoxLayout()
         
@@ -31,11 +57,37 @@ class ChatWidget(QWidget):
         self.topic_input = QLineEdit()
         self.topic_input.setPlaceholderText("Enter topic for mind map")
         layout.addWidget(self.topic_input)
+
+        # عرض الفروع فور وصولها
+        self.stream_checkbox = QCheckBox("Show branches as they arrive")
+        self.stream_checkbox.setChecked(True)
+        layout.addWidget(self.stream_checkbox)
+        self.refresh_checkbox = QCheckBox("Ignore cached result")
+        layout.addWidget(self.refresh_checkbox)
+        self.refine_checkbox = QCheckBox("Refine previous maps (keep recent context)")
+        self.refine_checkbox.toggled.connect(self.set_refine)
+        layout.addWidget(self.refine_checkbox)
+        self.progressive_checkbox = QCheckBox("Progressive (double-click a branch to expand it)")
+        layout.addWidget(self.progressive_checkbox)
         
-        # Generate button
-        generate_btn = QPushButton("Generate Mind Map")
-        generate_btn.clicked.connect(self.generate_mindmap)
-        layout.addWidget(generate_btn)
+        # Generate / cancel buttons
+        buttons_layout = QHBoxLayout()
+        self.generate_btn = QPushButton("Generate Mind Map")
+        self.generate_btn.clicked.connect(self.generate_mindmap)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_generation)
+        buttons_layout.addWidget(self.generate_btn)
+        buttons_layout.addWidget(self.cancel_btn)
+        layout.addLayout(buttons_layout)
+
+        # Progress
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
         
         # Response display
         self.response_display = QTextEdit()
@@ -49,27 +101,119 @@ class ChatWidget(QWidget):
         if api_key:
             try:
                 save_api_key(api_key)
-                self.ai_chat.api_key = api_key
-                self.ai_chat.setup_model()
+                self.ai_chat.set_api_key(api_key)
                 QMessageBox.information(self, "Success", "API Key saved successfully!")
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to save API key: {str(e)}")
         else:
             QMessageBox.warning(self, "Warning", "Please enter an API key")
         
+    def set_refine(self, enabled):
+        self.ai_chat.refine = enabled
+        if not enabled:
+            self.ai_chat.context.clear()
+
     def generate_mindmap(self):
+        # تجاهل النقرة الثانية أثناء وجود طلب جارٍ
+        if self._worker is not None:
+            return
+
         topic = self.topic_input.text()
         if not topic:
             QMessageBox.warning(self, "Error", "Please enter a topic!")
             return
-            
-        try:
-            response = self.ai_chat.generate_mindmap(topic)
-            self.response_display.setText(f"Topic: {topic}\nResponse: {response}")
-            
-            # Parse JSON from response
-            mind_map_data = JSONParser.extract_json_from_response(response)
+
+        # المخطط الأولي صغير فلا حاجة لبثه
+        outline = self.progressive_checkbox.isChecked()
+        worker = GenerationWorker(self.ai_chat, topic,
+                                  self.stream_checkbox.isChecked() and not outline,
+                                  self.refresh_checkbox.isChecked(), outline)
+        worker.signals.progress.connect(self.status_label.setText)
+        worker.signals.centerReady.connect(lambda center: self.on_partial(worker, self.mindMapStarted, center))
+        worker.signals.branchReady.connect(lambda branch: self.on_partial(worker, self.branchGenerated, branch))
+        worker.signals.finished.connect(lambda response, data: self.on_generation_finished(worker, topic, response, data))
+        worker.signals.failed.connect(lambda message: self.on_generation_failed(worker, message))
+        self._worker = worker
+        self.set_busy(True)
+        self.thread_pool.start(worker)
+
+    def cancel_generation(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        self._worker = None
+        self.set_busy(False)
+        self.status_label.setText("Generation cancelled")
+        self.generationStopped.emit()
+
+    def set_busy(self, busy):
+        self.generate_btn.setEnabled(not busy)
+        self.cancel_btn.setEnabled(busy)
+        self.progress_bar.setVisible(busy)
+
+    def on_partial(self, worker, signal, value):
+        if worker is self._worker and not worker.is_cancelled():
+            signal.emit(value)
+
+    def on_generation_finished(self, worker, topic, response, mind_map_data):
+        if worker is not self._worker or worker.is_cancelled():
+            return
+        self._worker = None
+        self.set_busy(False)
+        cache = self.ai_chat.cache
+        usage = self.ai_chat.last_usage
+        status = (f"Cache: {cache.hits} hits / {cache.misses} misses | "
+                  f"Tokens: {usage['prompt_tokens']} in / {usage['response_tokens']} out")
+        # إظهار ما أصلحه المحلل في استجابة مقطوعة أو غير سليمة
+        if worker.report is not None and worker.report.repaired:
+            status += f" | Repaired: {worker.report.summary()}"
+        self.status_label.setText(status)
+        self.response_display.setText(f"Topic: {topic}\nResponse: {response}")
+        if worker.outline:
+            self.outlineGenerated.emit(mind_map_data)
+        else:
             self.mindMapGenerated.emit(mind_map_data)
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to generate mind map: {str(e)}")
\ No newline at end of file
+
+    def on_generation_failed(self, worker, message):
+        if worker is not self._worker or worker.is_cancelled():
+            return
+        self._worker = None
+        self.set_busy(False)
+        self.status_label.setText("")
+        self.generationStopped.emit()
+        QMessageBox.critical(self, "Error", f"Failed to generate mind map: {message}")
+
+
+    def expand_branch(self, path):
+        path = tuple(path)
+        self._wanted_expansions.add(path)
+        if path not in self._expanding:
+            self.start_expansion(path)
+        self.status_label.setText(f"Expanding {path[-1]}...")
+
+    def prefetch_expansions(self, paths):
+        # جلب الفروع المرجح فتحها في الخلفية بأولوية منخفضة
+        for path in paths:
+            path = tuple(path)
+            if path not in self._expanding and not self.ai_chat.has_expansion(path):
+                self.start_expansion(path, priority=-1)
+
+    def start_expansion(self, path, priority=0):
+        worker = ExpansionWorker(self.ai_chat, path)
+        worker.signals.finished.connect(self.on_expansion_finished)
+        worker.signals.failed.connect(self.on_expansion_failed)
+        self._expanding[path] = worker
+        self.thread_pool.start(worker, priority)
+
+    def on_expansion_finished(self, path, children):
+        self._expanding.pop(path, None)
+        if path in self._wanted_expansions:
+            self._wanted_expansions.discard(path)
+            self.status_label.setText("")
+            self.branchExpanded.emit(path, children)
+
+    def on_expansion_failed(self, path, message):
+        self._expanding.pop(path, None)
+        if path in self._wanted_expansions:
+            self._wanted_expansions.discard(path)
+            self.status_label.setText(f"Failed to expand {path[-1]}: {message}")
\ No newline at end of file
@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import sys
+from .backends import create_backend
+
+def run_gui():
+    from PyQt5.QtWidgets import QApplication
+    from .window import MindMapWindow
+
+    app = QApplication(sys.argv)
+    window = MindMapWindow()
+    window.show()
+    return app.exec_()
+
+def run_batch(args):
+    # التشغيل دون واجهة رسومية
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from .ai_chat import AIChat
+    from .batch import BatchRunner, read_topics
+    from .scene import MindMapScene
+
+    app = QApplication(sys.argv[:1])
+    topics = read_topics(args.topics)
+    runner = BatchRunner(AIChat(backend_from_args(args), requests=requests_from_args(args)), args.output,
+                         concurrency=args.concurrency, rate=args.rate,
+                         formats=args.format or ['png'], refresh=args.refresh)
+    scene = MindMapScene()
+    scene.layout_mode = args.layout
+    start_trace(args)
+    report = runner.run(topics, scene)
+    finish_trace(args)
+    print(json.dumps(report, indent=2))
+    return 1 if report['failed'] else 0
+
+def run_export(args):
+    # تصدير خريطة محفوظة دون واجهة رسومية
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    from .document import open_map
+    from .export import export_scene
+    from .scene import MindMapScene
+
+    app = QApplication(sys.argv[:1])
+    scene = MindMapScene()
+    scene.layout_mode = args.layout
+    start_trace(args)
+    open_map(scene, args.input)
+    try:
+        ok = export_scene(scene, args.output, args.format, scale=args.scale, dpi=args.dpi,
+                          tile_size=args.tile_size, workers=args.workers)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        finish_trace(args)
+    return 0 if ok else 1
+
+def start_trace(args):
+    if args.trace:
+        from .profiler import profiler
+        profiler.reset()
+        profiler.enable()
+
+def finish_trace(args):
+    # كتابة التتبع بصيغة Chrome trace للتحليل لاحقاً
+    if args.trace:
+        from .profiler import profiler
+        profiler.export_chrome_trace(args.trace)
+        profiler.enable(False)
+
+def backend_from_args(args):
+    if args.backend == 'fake':
+        return create_backend('fake', nodes=args.fake_nodes, depth=args.fake_depth,
+                              fan_out=args.fake_fan_out, latency=args.fake_latency,
+                              failure_rate=args.fake_failure_rate)
+    return create_backend(args.backend)
+
+def requests_from_args(args):
+    from .request_layer import RequestLayer
+    return RequestLayer(timeout=args.timeout, attempts=args.retries + 1,
+                        attempt_timeout=args.attempt_timeout, hedge_after=args.hedge_after,
+                        max_workers=max(4, args.concurrency * 2))
+
+def add_backend_arguments(parser):
+    parser.add_argument('--backend', choices=['gemini', 'fake'], default=None,
+                        help='LLM backend (default: $MINDMAP_BACKEND or gemini)')
+    parser.add_argument('--fake-nodes', type=int, default=50, help='nodes per fake map')
+    parser.add_argument('--fake-depth', type=int, default=3, help='depth of fake maps')
+    parser.add_argument('--fake-fan-out', type=int, default=5, help='maximum children in fake maps')
+    parser.add_argument('--fake-latency', type=float, default=0.0, help='fake response latency in seconds')
+    parser.add_argument('--fake-failure-rate', type=float, default=0.0,
+                        help='fraction of fake requests that fail with a transient error')
+
+def add_request_arguments(parser):
+    parser.add_argument('--timeout', type=float, default=60.0, help='latency budget per AI request in seconds')
+    parser.add_argument('--retries', type=int, default=2, help='retries after transient errors')
+    parser.add_argument('--attempt-timeout', type=float, default=None,
+                        help='abandon and retry an attempt slower than this (default: the whole budget)')
+    parser.add_argument('--hedge-after', type=float, default=None,
+                        help='send a duplicate request if no answer arrives within this many seconds')
+
+def add_layout_argument(parser):
+    parser.add_argument('--layout', choices=['radial', 'balanced', 'tidy', 'classic'], default='radial',
+                        help='layout for generated maps (saved documents keep their positions)')
+
+def add_trace_argument(parser):
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help='record timings and write them as Chrome trace-event JSON')
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m mindmap')
+    commands = parser.add_subparsers(dest='command')
+
+    batch = commands.add_parser('batch', help='generate mind maps for a list of topics')
+    batch.add_argument('topics', help="file with one topic per line, or '-' for stdin")
+    batch.add_argument('-o', '--output', default='mindmaps', help='output directory')
+    batch.add_argument('-c', '--concurrency', type=int, default=4, help='parallel AI requests')
+    batch.add_argument('--rate', type=float, default=None, help='maximum AI requests per second')
+    batch.add_argument('--format', action='append', choices=['png', 'svg', 'pdf', 'dzi'],
+                       help='image formats to write (repeatable, default png)')
+    batch.add_argument('--refresh', action='store_true', help='ignore cached results')
+    add_backend_arguments(batch)
+    add_request_arguments(batch)
+    add_layout_argument(batch)
+    add_trace_argument(batch)
+
+    export = commands.add_parser('export', help='render a saved or generated mind map')
+    export.add_argument('input', help='.mindmap document or mind map JSON file')
+    export.add_argument('-o', '--output', required=True, help='output file')
+    export.add_argument('--format', choices=['png', 'svg', 'pdf', 'dzi'],
+                        help='output format (default: from the output extension)')
+    export.add_argument('--scale', type=float, default=None, help='output pixels per scene unit')
+    export.add_argument('--dpi', type=int, default=None, help='PDF resolution')
+    export.add_argument('--tile-size', type=int, default=None, help='tile size for png and dzi')
+    export.add_argument('--workers', type=int, default=None, help='compression threads for png')
+    add_layout_argument(export)
+    add_trace_argument(export)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'batch':
+        return run_batch(args)
+    if args.command == 'export':
+        return run_export(args)
+    return run_gui()
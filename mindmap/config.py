@@ -2,9 +2,13 @@ import json
 import os
 from pathlib import Path
 
+def config_dir():
+    # المسار فقط دون إنشاء المجلد، لمن لا يحتاج ملف الإعدادات
+    return Path.home() / '.mindmap'
+
 class Config:
     def __init__(self):
-        self.config_dir = Path.home() / '.mindmap'
+        self.config_dir = config_dir()
         self.config_file = self.config_dir / 'config.json'
         self.ensure_config_dir()
 
@@ -26,6 +30,22 @@ class Config:
         with open(self.config_file, 'w') as f:
             json.dump(config, f)
 
-config = Config()
-load_api_key = config.load_api_key
-save_api_key = config.save_api_key
\ No newline at end of file
+# الإعدادات تُنشأ عند أول استخدام، فاستيراد الوحدة لا يلمس نظام الملفات
+_config = None
+
+def get_config():
+    global _config
+    if _config is None:
+        _config = Config()
+    return _config
+
+def load_api_key():
+    return get_config().load_api_key()
+
+def save_api_key(api_key):
+    return get_config().save_api_key(api_key)
+
+def __getattr__(name):
+    if name == 'config':
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,213 @@
+import json
+import os
+import struct
+from pathlib import Path
+import numpy as np
+from .tree import MindMapTree
+
+# صيغة المستند: ترويسة JSON ثم أعمدة النموذج كمصفوفات خام يمكن ربطها بالذاكرة
+FORMAT_NAME = 'mindmap'
+DOCUMENT_VERSION = 1
+MAGIC = b'MINDMAP\x00'
+ALIGNMENT = 64
+
+COLUMNS = (
+    ('parent', np.int32, ()),
+    ('level', np.int16, ()),
+    ('text_id', np.int32, ()),
+    ('collapsed', np.bool_, ()),
+    ('positions', np.float64, (2,)),
+)
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def column_layout(header_capacity, capacity):
+    offset = align(len(MAGIC) + 4 + header_capacity)
+    columns = {}
+    for name, dtype, shape in COLUMNS:
+        columns[name] = {'dtype': np.dtype(dtype).str, 'shape': [capacity, *shape], 'offset': offset}
+        offset = align(offset + capacity * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize)
+    return columns
+
+def document_header(tree, expandable, capacity, columns):
+    return {
+        'format': FORMAT_NAME,
+        'version': DOCUMENT_VERSION,
+        'size': len(tree),
+        'capacity': capacity,
+        'expandable': expandable,
+        'texts': tree.texts,
+        'columns': columns,
+    }
+
+def encode_header(header):
+    return json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def check_header(header):
+    if header.get('format') != FORMAT_NAME:
+        raise ValueError("Not a mind map document")
+    if header.get('version', 0) > DOCUMENT_VERSION:
+        raise ValueError(f"Unsupported document version: {header.get('version')}")
+
+def read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a mind map document")
+    header_capacity, = struct.unpack('<I', f.read(4))
+    header = json.loads(f.read(header_capacity).decode('utf-8'))
+    check_header(header)
+    return header_capacity, header
+
+def replace_file(path, write):
+    # الكتابة في ملف مؤقت ثم استبداله حتى لا يبقى مستند نصف مكتوب
+    temp = path.with_name(path.name + '.tmp')
+    with open(temp, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+def write_binary_document(path, tree, expandable):
+    capacity = max(len(tree.parent), 1)
+    # مساحة احتياطية في الترويسة والأعمدة حتى تُحفظ أغلب التعديلات في مكانها
+    header_capacity = align(len(encode_header(document_header(
+        tree, expandable, capacity, column_layout(0, capacity)))) * 2 + 4096)
+    columns = column_layout(header_capacity, capacity)
+    encoded = encode_header(document_header(tree, expandable, capacity, columns))
+
+    def write(f):
+        f.write(MAGIC)
+        f.write(struct.pack('<I', header_capacity))
+        f.write(encoded.ljust(header_capacity))
+        for name, dtype, shape in COLUMNS:
+            f.seek(columns[name]['offset'])
+            f.write(np.ascontiguousarray(getattr(tree, name)[:capacity], dtype=dtype).tobytes())
+    replace_file(path, write)
+
+def update_binary_document(path, tree, expandable):
+    # الحفظ التزايدي: كتابة الصفوف المتغيرة فقط، أو None إذا لزمت إعادة كتابة الملف
+    if not path.exists():
+        return None
+    with open(path, 'rb') as f:
+        header_capacity, header = read_header(f)
+    capacity = header['capacity']
+    columns = header['columns']
+    if capacity < len(tree) or columns != column_layout(header_capacity, capacity):
+        return None
+    encoded = encode_header(document_header(tree, expandable, capacity, columns))
+    if len(encoded) > header_capacity:
+        return None
+
+    size = len(tree)
+    changed = np.zeros(size, dtype=bool)
+    for name, dtype, shape in COLUMNS:
+        stored = np.memmap(path, dtype=dtype, mode='r+', offset=columns[name]['offset'],
+                           shape=tuple(columns[name]['shape']))
+        current = getattr(tree, name)[:size]
+        differs = stored[:size] != current
+        if shape:
+            differs = differs.any(axis=1)
+        # الصفوف الجديدة بعد آخر حفظ تُكتب دائماً
+        differs[header['size']:] = True
+        rows = np.nonzero(differs)[0]
+        if len(rows):
+            stored[rows] = current[rows]
+            stored.flush()
+        changed |= differs
+        del stored
+
+    with open(path, 'r+b') as f:
+        f.seek(len(MAGIC) + 4)
+        f.write(encoded.ljust(header_capacity))
+        f.flush()
+        os.fsync(f.fileno())
+    return int(changed.sum())
+
+def read_binary_document(path, mmap=True):
+    with open(path, 'rb') as f:
+        header_capacity, header = read_header(f)
+        size = header['size']
+        arrays = {}
+        for name, dtype, shape in COLUMNS:
+            column = header['columns'][name]
+            if mmap:
+                array = np.memmap(path, dtype=column['dtype'], mode='r', offset=column['offset'],
+                                  shape=tuple(column['shape']))
+            else:
+                f.seek(column['offset'])
+                array = np.fromfile(f, dtype=column['dtype'],
+                                    count=int(np.prod(column['shape']))).reshape(column['shape'])
+            arrays[name] = array[:size]
+    return header, arrays
+
+def document_to_json(tree, expandable=False):
+    size = len(tree)
+    return {
+        'format': FORMAT_NAME,
+        'version': DOCUMENT_VERSION,
+        'expandable': expandable,
+        'texts': tree.texts,
+        'parent': tree.parent[:size].tolist(),
+        'level': tree.level[:size].tolist(),
+        'text_id': tree.text_id[:size].tolist(),
+        'collapsed': np.nonzero(tree.collapsed[:size])[0].tolist(),
+        'x': tree.positions[:size, 0].tolist(),
+        'y': tree.positions[:size, 1].tolist(),
+    }
+
+def document_from_json(data):
+    check_header(data)
+    size = len(data['parent'])
+    collapsed = np.zeros(size, dtype=bool)
+    collapsed[data.get('collapsed', [])] = True
+    positions = np.column_stack((data['x'], data['y'])) if size else np.zeros((0, 2))
+    tree = MindMapTree.from_columns(data['texts'], data['parent'], data['text_id'],
+                                    data['level'], positions, collapsed)
+    return tree, data.get('expandable', False)
+
+def save_document(path, tree, expandable=False):
+    # إرجاع عدد العقد المكتوبة
+    path = Path(path)
+    if path.suffix.lower() == '.json':
+        encoded = json.dumps(document_to_json(tree, expandable), ensure_ascii=False).encode('utf-8')
+        replace_file(path, lambda f: f.write(encoded))
+        return len(tree)
+
+    try:
+        written = update_binary_document(path, tree, expandable)
+    except (OSError, ValueError, KeyError):
+        written = None
+    if written is None:
+        write_binary_document(path, tree, expandable)
+        written = len(tree)
+    return written
+
+def load_document(path, mmap=True):
+    path = Path(path)
+    if path.suffix.lower() == '.json':
+        with open(path, encoding='utf-8') as f:
+            return document_from_json(json.load(f))
+
+    header, arrays = read_binary_document(path, mmap)
+    tree = MindMapTree.from_columns(header['texts'], arrays['parent'], arrays['text_id'],
+                                    arrays['level'], arrays['positions'], arrays['collapsed'])
+    return tree, header.get('expandable', False)
+
+def open_map(scene, path):
+    # المستندات المحفوظة تُعرض مباشرة، وملفات JSON المولدة تمر بالتخطيط
+    path = Path(path)
+    if path.suffix.lower() == '.json':
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('format') != FORMAT_NAME:
+            scene.create_from_json(data)
+            return
+        tree, expandable = document_from_json(data)
+    else:
+        tree, expandable = load_document(path)
+    scene.load_tree(tree, expandable)
+
+def save_scene(scene, path):
+    if scene.tree is None:
+        raise ValueError("There is no mind map to save")
+    return save_document(path, scene.tree, scene.expandable_leaves)
@@ -0,0 +1,221 @@
+from PyQt5.QtWidgets import *
+from PyQt5.QtGui import *
+from PyQt5.QtCore import *
+from PyQt5.QtSvg import QSvgGenerator
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from pathlib import Path
+import numpy as np
+import struct
+import zlib
+import math
+from .profiler import traced
+
+TILE_SIZE = 512
+
+def scene_bounds(scene):
+    # في الوضع الافتراضي لا توجد كل العناصر، فنأخذ الحدود من النموذج
+    if getattr(scene, 'virtual', False):
+        rect = scene.map_bounds()
+        scene.refresh_viewport(rect)
+        return rect
+    return scene.itemsBoundingRect()
+
+def export_bounds(scene):
+    # الحدود دون إنشاء كل العناصر، لأن التصدير المجزأ ينشئ عناصر كل بلاطة وحدها
+    if getattr(scene, 'virtual', False):
+        return scene.map_bounds()
+    return scene.itemsBoundingRect()
+
+def restore_viewport(scene):
+    if getattr(scene, 'virtual', False):
+        scene.refresh_viewport()
+
+def output_size(rect, scale):
+    return max(1, math.ceil(rect.width() * scale)), max(1, math.ceil(rect.height() * scale))
+
+def prepare_region(scene, source):
+    # في الوضع الافتراضي تُنشأ عناصر صف البلاطات الحالي فقط
+    if getattr(scene, 'virtual', False):
+        scene.refresh_viewport(source)
+
+def render_tile(scene, image, target, source):
+    # رسم جزء من المشهد في جزء من الصورة
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setRenderHint(QPainter.TextAntialiasing)
+    scene.render(painter, target, source)
+    painter.end()
+
+def image_rows(image, width, height):
+    # صفوف RGB مع بايت المرشح (0) في بداية كل صف كما يتطلب PNG
+    bits = image.constBits()
+    bits.setsize(image.byteCount())
+    pixels = np.frombuffer(bits, np.uint8).reshape(image.height(), image.bytesPerLine())
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = pixels[:height, :width * 3]
+    return rows.tobytes()
+
+def deflate(data, level, last):
+    # ضغط كل شريط وحده ثم وصلها في تيار deflate واحد كما يفعل pigz
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+class PNGStreamWriter:
+    # كتابة PNG على دفعات دون الاحتفاظ بالصورة كاملة في الذاكرة
+    def __init__(self, file_name, width, height):
+        self.file = open(file_name, 'wb')
+        self.adler = 1
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self.chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        # ترويسة zlib، والتجميع الاختباري يُضاف في النهاية
+        self.chunk(b'IDAT', b'\x78\x9c')
+
+    def chunk(self, kind, data):
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(kind)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind))))
+
+    def write(self, rows, compressed):
+        self.adler = zlib.adler32(rows, self.adler)
+        self.chunk(b'IDAT', compressed)
+
+    def close(self):
+        self.chunk(b'IDAT', struct.pack('>I', self.adler))
+        self.chunk(b'IEND', b'')
+        self.file.close()
+
+@traced('export.png')
+def export_png(scene, file_name, scale=1.0, tile_size=TILE_SIZE, workers=1, level=6):
+    # التصدير على شرائح بارتفاع بلاطة واحدة، فالذاكرة بحجم العرض × البلاطة لا الصورة كاملة
+    rect = export_bounds(scene)
+    width, height = output_size(rect, scale)
+    tile_size = max(16, int(tile_size))
+    strips = math.ceil(height / tile_size)
+
+    writer = PNGStreamWriter(file_name, width, height)
+    pending = deque()
+    try:
+        # الرسم في الخيط الرئيسي لأن المشهد غير آمن للخيوط، والضغط في خيوط العمل
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for strip in range(strips):
+                top = strip * tile_size
+                rows_height = min(tile_size, height - top)
+                image = QImage(width, rows_height, QImage.Format_RGB888)
+                image.fill(Qt.white)
+                prepare_region(scene, QRectF(rect.left(), rect.top() + top / scale,
+                                             rect.width(), rows_height / scale))
+                for left in range(0, width, tile_size):
+                    columns = min(tile_size, width - left)
+                    target = QRectF(left, 0, columns, rows_height)
+                    source = QRectF(rect.left() + left / scale, rect.top() + top / scale,
+                                    columns / scale, rows_height / scale)
+                    render_tile(scene, image, target, source)
+                rows = image_rows(image, width, rows_height)
+                pending.append((rows, pool.submit(deflate, rows, level, strip == strips - 1)))
+
+                # عدد محدود من الشرائح في الانتظار حتى تبقى الذاكرة محدودة
+                while len(pending) > max(1, workers):
+                    rows, future = pending.popleft()
+                    writer.write(rows, future.result())
+            while pending:
+                rows, future = pending.popleft()
+                writer.write(rows, future.result())
+    finally:
+        writer.close()
+        restore_viewport(scene)
+    return True
+
+@traced('export.dzi')
+def export_tiles(scene, file_name, tile_size=256, scale=1.0):
+    # هرم بلاطات بصيغة Deep Zoom (DZI) للعرض المتدرج في المتصفح
+    rect = export_bounds(scene)
+    width, height = output_size(rect, scale)
+    path = Path(file_name)
+    tiles_dir = path.with_name(path.stem + '_files')
+    max_level = math.ceil(math.log2(max(width, height, 1)))
+
+    try:
+        for level in range(max_level + 1):
+            factor = scale / 2 ** (max_level - level)
+            level_width, level_height = output_size(rect, factor)
+            level_dir = tiles_dir / str(level)
+            level_dir.mkdir(parents=True, exist_ok=True)
+            for row, top in enumerate(range(0, level_height, tile_size)):
+                prepare_region(scene, QRectF(rect.left(), rect.top() + top / factor,
+                                             rect.width(), tile_size / factor))
+                for column, left in enumerate(range(0, level_width, tile_size)):
+                    columns = min(tile_size, level_width - left)
+                    rows = min(tile_size, level_height - top)
+                    image = QImage(columns, rows, QImage.Format_RGB888)
+                    image.fill(Qt.white)
+                    source = QRectF(rect.left() + left / factor, rect.top() + top / factor,
+                                    columns / factor, rows / factor)
+                    render_tile(scene, image, QRectF(0, 0, columns, rows), source)
+                    image.save(str(level_dir / f"{column}_{row}.png"))
+    finally:
+        restore_viewport(scene)
+
+    path.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+        f'Format="png" Overlap="0" TileSize="{tile_size}">'
+        f'<Size Width="{width}" Height="{height}"/></Image>\n', encoding='utf-8')
+    return True
+
+@traced('export.svg')
+def export_svg(scene, file_name, scale=1.0):
+    rect = scene_bounds(scene)
+    width, height = output_size(rect, scale)
+    generator = QSvgGenerator()
+    generator.setFileName(file_name)
+    generator.setSize(QSize(width, height))
+    generator.setViewBox(QRectF(0, 0, width, height))
+
+    painter = QPainter(generator)
+    painter.setRenderHint(QPainter.Antialiasing)
+    scene.render(painter, QRectF(0, 0, width, height), rect)
+    result = painter.end()
+    restore_viewport(scene)
+    return result
+
+@traced('export.pdf')
+def export_pdf(scene, file_name, scale=1.0, dpi=300):
+    # صفحة واحدة بحجم الخريطة، كل بكسل في المشهد نقطة طباعية مضروبة في المقياس
+    rect = scene_bounds(scene)
+    writer = QPdfWriter(file_name)
+    writer.setResolution(dpi)
+    writer.setPageSize(QPageSize(QSizeF(rect.width() * scale, rect.height() * scale), QPageSize.Point))
+    writer.setPageMargins(QMarginsF(0, 0, 0, 0))
+
+    painter = QPainter(writer)
+    painter.setRenderHint(QPainter.Antialiasing)
+    scene.render(painter, QRectF(painter.viewport()), rect)
+    result = painter.end()
+    restore_viewport(scene)
+    return result
+
+EXPORTERS = {
+    'png': export_png,
+    'svg': export_svg,
+    'pdf': export_pdf,
+    'dzi': export_tiles,
+}
+
+# الخيارات التي يقبلها كل مصدِّر
+EXPORT_OPTIONS = {
+    'png': ('scale', 'tile_size', 'workers'),
+    'svg': ('scale',),
+    'pdf': ('scale', 'dpi'),
+    'dzi': ('scale', 'tile_size'),
+}
+
+def export_scene(scene, file_name, fmt=None, **options):
+    # اختيار الصيغة من امتداد الملف إذا لم تُحدد
+    fmt = fmt or Path(file_name).suffix.lstrip('.').lower() or 'png'
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    options = {name: value for name, value in options.items()
+               if name in EXPORT_OPTIONS[fmt] and value is not None}
+    return EXPORTERS[fmt](scene, file_name, **options)
@@ -0,0 +1,213 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+from pathlib import Path
+from .config import config_dir
+from .document import load_document, write_binary_document
+
+# سجل التعديلات: لقطة كاملة للنموذج ثم سطر JSON لكل تعديل بعدها
+_FILE_PATTERN = re.compile(r'^(snapshot|journal)-(\d+)\.(mindmap|log)$')
+
+def journal_files(directory):
+    # الملفات حسب الجيل: {الجيل: {'snapshot': مسار، 'journal': مسار}}
+    generations = {}
+    if directory.exists():
+        for path in directory.iterdir():
+            match = _FILE_PATTERN.match(path.name)
+            if match:
+                generations.setdefault(int(match.group(2)), {})[match.group(1)] = path
+    return generations
+
+def apply_record(tree, record):
+    # تطبيق تعديل واحد على النموذج، والحذف يعيد نموذجاً جديداً
+    op = record['op']
+    if op == 'move':
+        tree.move_node(record['index'], record['x'], record['y'])
+    elif op == 'text':
+        tree.set_text(record['index'], record['text'])
+    elif op == 'insert':
+        tree.add_node(record['text'], record['parent'], record['x'], record['y'])
+    elif op == 'subtree':
+        first = len(tree)
+        tree.add_children(record['parent'], record['children'])
+        tree.positions[first:len(tree)] = record['positions']
+    elif op == 'collapse':
+        tree.collapsed[record['index']] = record['collapsed']
+    elif op == 'delete':
+        tree = tree.remove_subtree(record['index'])
+    else:
+        raise ValueError(f"Unknown journal operation: {op}")
+    return tree
+
+def recover(directory=None):
+    # إعادة بناء آخر حالة من آخر لقطة وسجلها، فمدة الاستعادة محدودة بحجم السجل بين لقطتين
+    directory = Path(directory or config_dir() / 'journal')
+    generations = journal_files(directory)
+    complete = [generation for generation, files in generations.items() if 'snapshot' in files]
+    if not complete:
+        return None
+    files = generations[max(complete)]
+    tree, expandable = load_document(files['snapshot'], mmap=False)
+
+    replayed = 0
+    if 'journal' in files:
+        with open(files['journal'], encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # سطر أخير لم تكتمل كتابته قبل الانهيار
+                    break
+                tree = apply_record(tree, record)
+                replayed += 1
+    return tree, expandable, replayed
+
+class EditJournal:
+    def __init__(self, directory=None, batch_interval=0.25, compact_every=2000, on_error=None):
+        self.directory = Path(directory or config_dir() / 'journal')
+        self.batch_interval = batch_interval
+        # عدد التعديلات قبل ضغط السجل في لقطة جديدة
+        self.compact_every = compact_every
+        self.records = 0
+        self.active = False
+        # آخر خطأ كتابة، والسجل يتوقف بعده حتى اللقطة التالية
+        self.error = None
+        # يُستدعى من خيط السجل بالخطأ عند توقف التسجيل
+        self.on_error = on_error
+        generations = journal_files(self.directory)
+        self.generation = max(generations, default=0)
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def has_recovery(self):
+        return any('snapshot' in files for files in journal_files(self.directory).values())
+
+    def needs_compaction(self):
+        return self.records >= self.compact_every
+
+    def record(self, op, **fields):
+        if not self.active:
+            return
+        fields['op'] = op
+        self.records += 1
+        self._queue.put(('record', fields))
+
+    def snapshot(self, tree, expandable=False):
+        # نسخة النموذج تؤخذ في الخيط الرئيسي، والكتابة تتم في خيط السجل
+        self.start()
+        self.active = True
+        self.error = None
+        self.records = 0
+        self._queue.put(('snapshot', (tree.copy(), expandable)))
+
+    def discard(self):
+        # حذف السجل السابق دون استعادته
+        self.start()
+        self.active = False
+        self._queue.put(('discard', None))
+
+    def flush(self):
+        # انتظار كتابة كل ما في الطابور
+        if self._thread is not None:
+            done = threading.Event()
+            self._queue.put(('flush', done))
+            done.wait()
+
+    def close(self, discard=True):
+        # عند الإغلاق الطبيعي لا حاجة للاستعادة فيُحذف السجل
+        if self._thread is None:
+            return
+        if discard:
+            self.discard()
+        self._queue.put(('close', None))
+        self._thread.join()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name='mindmap-journal', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        log = None
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            # تجميع ما يصل خلال فترة قصيرة في كتابة واحدة ومزامنة واحدة
+            deadline = time.monotonic() + self.batch_interval
+            while batch[-1][0] == 'record':
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            lines = []
+            for kind, payload in batch:
+                if kind == 'record':
+                    lines.append(json.dumps(payload, ensure_ascii=False) + '\n')
+                    continue
+                # خطأ الكتابة لا يوقف الخيط، فطلبات flush وclose تصل دائماً
+                try:
+                    log = self._write(log, lines)
+                    if kind == 'snapshot':
+                        log = self._compact(log, *payload)
+                    elif kind == 'discard':
+                        log = self._remove(log, self.generation + 1)
+                except Exception as e:
+                    log = self._fail(log, e)
+                lines = []
+                if kind == 'flush':
+                    payload.set()
+                elif kind == 'close':
+                    running = False
+            try:
+                log = self._write(log, lines)
+            except Exception as e:
+                log = self._fail(log, e)
+        if log is not None:
+            log.close()
+
+    def _fail(self, log, error):
+        # امتلاء القرص أو الصلاحيات: إيقاف التسجيل وإبلاغ الواجهة بدلاً من موت الخيط بصمت
+        self.error = error
+        self.active = False
+        if self.on_error is not None:
+            self.on_error(error)
+        if log is not None:
+            try:
+                log.close()
+            except OSError:
+                pass
+        return None
+
+    def _write(self, log, lines):
+        if lines and log is not None:
+            log.write(''.join(lines))
+            log.flush()
+            os.fsync(log.fileno())
+        return log
+
+    def _compact(self, log, tree, expandable):
+        # لقطة جديدة ثم سجل فارغ لها، وبعدها يُحذف الجيل السابق
+        generation = self.generation + 1
+        write_binary_document(self.directory / f"snapshot-{generation}.mindmap", tree, expandable)
+        self.generation = generation
+        log = self._remove(log, generation)
+        return open(self.directory / f"journal-{generation}.log", 'a', encoding='utf-8')
+
+    def _remove(self, log, keep):
+        # حذف كل الأجيال الأقدم من keep
+        if log is not None:
+            log.close()
+        for generation, files in journal_files(self.directory).items():
+            if generation < keep:
+                for path in files.values():
+                    path.unlink(missing_ok=True)
+        return None
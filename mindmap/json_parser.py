@@ -3,24 +3,335 @@ from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 import json
 import re
+from .profiler import traced
+
+# الرموز المهمة فقط: نص كامل أو مقطوع في النهاية، أو علامة بنية
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"?|[{}\[\],:]')
+_CLOSERS = {'{': '}', '[': ']'}
+_DECODER = json.JSONDecoder()
+
+class ParseReport:
+    # ما تم إصلاحه في الاستجابة وما بقي صالحاً منها
+    def __init__(self):
+        self.fenced = False
+        self.skipped_chars = 0
+        self.trailing_commas = 0
+        self.truncated = False
+        self.closed = 0
+        self.dropped_chars = 0
+        self.dropped_nodes = 0
+        self.nodes = 0
+
+    @property
+    def repaired(self):
+        return bool(self.trailing_commas or self.truncated or self.dropped_nodes)
+
+    @property
+    def usable(self):
+        return self.nodes > 1
+
+    def as_dict(self):
+        return {'fenced': self.fenced, 'skipped_chars': self.skipped_chars,
+                'trailing_commas': self.trailing_commas, 'truncated': self.truncated,
+                'closed': self.closed, 'dropped_chars': self.dropped_chars,
+                'dropped_nodes': self.dropped_nodes, 'nodes': self.nodes}
+
+    def summary(self):
+        parts = []
+        if self.truncated:
+            parts.append(f"closed {self.closed} truncated structures")
+        if self.trailing_commas:
+            parts.append(f"removed {self.trailing_commas} trailing commas")
+        if self.dropped_nodes:
+            parts.append(f"dropped {self.dropped_nodes} invalid nodes")
+        return ', '.join(parts)
 
 class JSONParser:
     @staticmethod
     def extract_json_from_response(response_text):
-        # Find JSON content between ```json and ``` markers
-        json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
+        data, report = JSONParser.parse_response(response_text)
+        if not report.usable:
+            raise ValueError("No usable mind map found in response")
+        return data
+
+    @staticmethod
+    @traced('json.parse')
+    def parse_response(response_text, schema='mindmap', max_candidates=16):
+        # استخراج وإصلاح ثم التحقق من البنية، مع تقرير بما تم.
+        # إذا فشل الكائن الأول يُجرَّب الكائن الذي يبدأ عند { التالية، كنص قبل JSON يحتوي أقواساً
+        validate = JSONParser.validate_children if schema == 'children' else JSONParser.validate_mindmap
+        error = None
+        fallback = None
+        begin = None
+        for _ in range(max_candidates):
+            report = ParseReport()
             try:
-                return json.loads(json_str)
-            except json.JSONDecodeError:
-                raise ValueError("Invalid JSON format in response")
-        else:
+                data = validate(JSONParser.repair_json(response_text, report, begin), report)
+            except ValueError as e:
+                error = error or e
+            else:
+                if report.usable:
+                    return data, report
+                fallback = fallback or (data, report)
+            begin = response_text.find('{', report.skipped_chars + 1)
+            if begin < 0:
+                break
+        if fallback is not None:
+            return fallback
+        raise error
+
+    @staticmethod
+    def repair_json(text, report=None, begin=None):
+        # مرور واحد على الرموز: أول كائن خارجي، أو الكائن عند begin،
+        # حذف الفواصل الزائدة وإغلاق البنى المقطوعة
+        report = report if report is not None else ParseReport()
+        fence = text.find('```json')
+        if begin is None:
+            begin = text.find('{', fence + 7 if fence >= 0 else 0)
+            if begin < 0 and fence >= 0:
+                begin = text.find('{')
+        if begin < 0:
             raise ValueError("No JSON content found in response")
+        report.fenced = fence >= 0
+        report.skipped_chars = begin
+        try:
+            # المسار السريع: استجابة سليمة تُحلل مباشرة ويُتجاهل ما بعد الكائن
+            return _DECODER.raw_decode(text, begin)[0]
+        except json.JSONDecodeError:
+            pass
+
+        stack = []
+        # الفواصل المحذوفة، وآخر موضع يمكن القطع عنده مع بقاء JSON صالحاً.
+        # بعد آخر موضع آمن لا يُفتح إلا كائنات، فالبنى المفتوحة عنده أول safe_depth من المكدس
+        dropped = []
+        comma = -1
+        safe = begin
+        safe_depth = 0
+        end = None
+        expect_key = False
+        for match in _TOKEN.finditer(text, begin):
+            token = match.group()
+            first = token[0]
+            if comma >= 0 and first not in '}]':
+                comma = -1
+            if first == '"':
+                if len(token) < 2 or token[-1] != '"':
+                    break
+                if not (expect_key and stack[-1] == '{'):
+                    safe, safe_depth = match.end(), len(stack)
+            elif first in '{[':
+                stack.append(first)
+                expect_key = first == '{'
+                # الكائن الجزئي يُحذف كاملاً، أما القائمة الفارغة فصالحة حيث وردت
+                if first == '[' or len(stack) == 1:
+                    safe, safe_depth = match.end(), len(stack)
+            elif first in '}]':
+                if _CLOSERS[stack[-1]] != first:
+                    break
+                if comma >= 0 and not text[comma + 1:match.start()].strip():
+                    dropped.append(comma)
+                comma = -1
+                stack.pop()
+                expect_key = False
+                safe, safe_depth = match.end(), len(stack)
+                if not stack:
+                    end = safe
+                    break
+            elif first == ':':
+                expect_key = False
+            elif first == ',':
+                comma = match.start()
+                expect_key = stack[-1] == '{'
+
+        if end is None:
+            # استجابة مقطوعة: العودة إلى آخر قيمة مكتملة ثم إغلاق ما بقي مفتوحاً
+            end = safe
+            stack = stack[:safe_depth]
+            report.truncated = True
+            report.closed = len(stack)
+            report.dropped_chars = len(text.rstrip()) - safe
+        else:
+            stack = []
+
+        report.trailing_commas = len(dropped)
+        pieces = []
+        last = begin
+        for position in dropped:
+            pieces.append(text[last:position])
+            last = position + 1
+        pieces.append(text[last:end])
+        pieces.extend(_CLOSERS[opener] for opener in reversed(stack))
+        try:
+            return json.loads(''.join(pieces))
+        except json.JSONDecodeError:
+            raise ValueError("Invalid JSON format in response")
+
+    @staticmethod
+    def _node(value, report):
+        # عقدة صالحة: كائن بنص غير فارغ، والنص المجرد يُقبل كورقة
+        if isinstance(value, str) and value.strip():
+            return {'text': value}
+        if isinstance(value, dict):
+            text = value.get('text')
+            if isinstance(text, (int, float)) and not isinstance(text, bool):
+                text = str(text)
+            if isinstance(text, str) and text.strip():
+                node = dict(value)
+                node['text'] = text
+                return node
+        report.dropped_nodes += 1
+        return None
+
+    @staticmethod
+    def _validate_nodes(nodes, report):
+        # التحقق تكرارياً دون عودية، مع حذف العقد غير الصالحة وأبنائها
+        valid = []
+        stack = [(nodes, valid)]
+        while stack:
+            items, target = stack.pop()
+            if not isinstance(items, list):
+                report.dropped_nodes += 1
+                continue
+            for item in items:
+                node = JSONParser._node(item, report)
+                if node is None:
+                    continue
+                report.nodes += 1
+                target.append(node)
+                children = node.pop('children', None)
+                if children:
+                    node['children'] = []
+                    stack.append((children, node['children']))
+        return valid
+
+    @staticmethod
+    def validate_mindmap(data, report):
+        # البنية المطلوبة: {"center": نص، "branches": [{"text": نص، "children": [...]}]}
+        if not isinstance(data, dict):
+            raise ValueError("Mind map must be a JSON object")
+        center = data.get('center')
+        if not isinstance(center, str) or not center.strip():
+            raise ValueError("Mind map has no center topic")
+        result = dict(data)
+        result['branches'] = JSONParser._validate_nodes(data.get('branches', []), report)
+        report.nodes += 1
+        return result
+
+    @staticmethod
+    def validate_children(data, report):
+        # أبناء فرع واحد، مع قبول شكل الخريطة الكاملة أيضاً
+        if isinstance(data, dict) and isinstance(data.get('children'), list):
+            children = data['children']
+        elif isinstance(data, dict) and isinstance(data.get('branches'), list):
+            children = data['branches']
+        elif isinstance(data, list):
+            children = data
+        else:
+            raise ValueError("No children found in response")
+        children = JSONParser._validate_nodes(children, report)
+        # الفرع الموسَّع نفسه موجود، فالنتيجة صالحة إذا وصل ابن واحد على الأقل
+        report.nodes += 1
+        return children
+
+    @staticmethod
+    def extract_children(response_text):
+        children, report = JSONParser.parse_response(response_text, 'children')
+        if not report.usable:
+            raise ValueError("No children found in response")
+        return children
 
     @staticmethod
     def clean_json_string(json_str):
-        # Remove any non-JSON content
-        json_str = re.sub(r'^.*?{', '{', json_str, flags=re.DOTALL)
-        json_str = re.sub(r'}.*?$', '}', json_str, flags=re.DOTALL)
-        return json_str
\ No newline at end of file
+        # نص JSON صالح من استجابة قد تحتوي نصاً حولها أو تكون مقطوعة
+        return json.dumps(JSONParser.repair_json(json_str), ensure_ascii=False)
+
+class IncrementalJSONParser:
+    # محلل تدريجي يُخرج المركز وكل فرع فور اكتماله أثناء وصول الاستجابة
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = True
+        self._key = None
+        self._branch_start = None
+        self.center = None
+        self.branches = []
+
+    def feed(self, chunk):
+        events = []
+        if self._done:
+            return events
+
+        self._buffer += chunk
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if not self._started:
+                if ch == '{':
+                    self._started = True
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._end_root_string(buffer[self._string_start:i + 1], events)
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in '{[':
+                self._depth += 1
+                if self._depth == 3 and ch == '{' and self._key == 'branches':
+                    self._branch_start = i
+            elif ch in '}]':
+                if self._depth == 3 and ch == '}' and self._branch_start is not None:
+                    self._end_branch(buffer[self._branch_start:i + 1], events)
+                self._depth -= 1
+                if self._depth == 0:
+                    self._done = True
+                    i += 1
+                    break
+            elif self._depth == 1:
+                if ch == ':':
+                    self._expect_key = False
+                elif ch == ',':
+                    self._expect_key = True
+            i += 1
+
+        self._pos = i
+        return events
+
+    def _end_root_string(self, literal, events):
+        try:
+            value = json.loads(literal)
+        except json.JSONDecodeError:
+            return
+        if self._expect_key:
+            self._key = value
+        elif self._key == 'center' and self.center is None:
+            self.center = value
+            events.append(('center', value))
+
+    def _end_branch(self, literal, events):
+        self._branch_start = None
+        try:
+            branch = json.loads(literal)
+        except json.JSONDecodeError:
+            return
+        # الفرع يمر بالتحقق نفسه الذي تمر به الاستجابة الكاملة قبل وصوله إلى المشهد
+        branches = JSONParser._validate_nodes([branch], ParseReport())
+        if branches:
+            self.branches.append(branches[0])
+            events.append(('branch', branches[0]))
+
+    def result(self):
+        return {'center': self.center, 'branches': list(self.branches)}
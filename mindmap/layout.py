@@ -0,0 +1,430 @@
+import math
+import numpy as np
+
+# إزاحات الخلايا المجاورة في الشبكة (الخلية نفسها وجيرانها الثمانية)
+_NEIGHBOR_OFFSETS = [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
+
+
+def neighbor_pairs(positions, cell_size, max_pairs=1 << 21):
+    # كل الأزواج التي قد تقع ضمن مسافة cell_size باستخدام شبكة منتظمة، دفعات من
+    # max_pairs زوج تقريباً حتى تبقى الذاكرة محدودة عند تكدس العقد في خلايا قليلة
+    count = len(positions)
+    if count < 2:
+        return
+
+    cells = np.floor(positions / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    width = int(cells[:, 0].max()) + 3
+    keys = (cells[:, 1] + 1) * width + (cells[:, 0] + 1)
+
+    cell_keys, cell_of, cell_counts = np.unique(keys, return_inverse=True, return_counts=True)
+    cell_of = cell_of.reshape(-1)
+    order = np.argsort(cell_of, kind='stable')
+    cell_start = np.cumsum(cell_counts) - cell_counts
+
+    # بداية وعدد عقد كل خلية مجاورة لكل عقدة
+    starts = np.zeros((len(_NEIGHBOR_OFFSETS), count), dtype=np.int64)
+    counts = np.zeros((len(_NEIGHBOR_OFFSETS), count), dtype=np.int64)
+    for k, (dx, dy) in enumerate(_NEIGHBOR_OFFSETS):
+        neighbor_keys = keys + dy * width + dx
+        slot = np.minimum(np.searchsorted(cell_keys, neighbor_keys), len(cell_keys) - 1)
+        present = cell_keys[slot] == neighbor_keys
+        counts[k] = np.where(present, cell_counts[slot], 0)
+        starts[k] = cell_start[slot]
+    ends = np.cumsum(counts.sum(axis=0))
+
+    first = 0
+    while first < count:
+        base = ends[first - 1] if first else 0
+        last = max(first + 1, int(np.searchsorted(ends, base + max_pairs, 'right')))
+        sources = []
+        targets = []
+        for k in range(len(_NEIGHBOR_OFFSETS)):
+            chunk = counts[k, first:last]
+            total = int(chunk.sum())
+            if not total:
+                continue
+            # توسيع المجالات [start, start + count) إلى قائمة مسطحة من الأزواج
+            group_start = np.cumsum(chunk) - chunk
+            flat = np.arange(total) + np.repeat(starts[k, first:last] - group_start, chunk)
+            sources.append(np.repeat(np.arange(first, last), chunk))
+            targets.append(order[flat])
+        if sources:
+            sources = np.concatenate(sources)
+            targets = np.concatenate(targets)
+            distinct = sources != targets
+            yield sources[distinct], targets[distinct]
+        first = last
+
+
+def relax_positions(positions, min_distance, damping=0.6, iterations=50, fixed=None, max_pairs=1 << 21):
+    # دفع العقد المتقاربة بعيداً عن بعضها حتى تتحقق المسافة الدنيا.
+    # القوة صفر بعد min_distance، فالخلايا المجاورة تكفي والنتيجة مطابقة للحساب الزوجي الكامل
+    positions = np.array(positions, dtype=np.float64).reshape(-1, 2)
+    count = len(positions)
+    if count < 2:
+        return positions
+
+    movable = np.ones(count, dtype=bool)
+    if fixed is not None:
+        movable[fixed] = False
+
+    for _ in range(iterations):
+        total_x = np.zeros(count)
+        total_y = np.zeros(count)
+        moved = False
+        for sources, targets in neighbor_pairs(positions, min_distance, max_pairs):
+            delta = positions[targets] - positions[sources]
+            distance = np.hypot(delta[:, 0], delta[:, 1])
+            close = distance < min_distance
+            if not close.any():
+                continue
+            moved = True
+
+            sources = sources[close]
+            delta = delta[close]
+            distance = distance[close]
+
+            # اتجاه القوة، وعند تطابق الموقعين نستخدم المحور السيني كما في atan2(0, 0)
+            unit = np.zeros_like(delta)
+            unit[:, 0] = 1.0
+            nonzero = distance > 0
+            unit[nonzero] = delta[nonzero] / distance[nonzero, None]
+
+            force = -(min_distance - distance)[:, None] * unit * damping
+            total_x += np.bincount(sources, weights=force[:, 0], minlength=count)
+            total_y += np.bincount(sources, weights=force[:, 1], minlength=count)
+        if not moved:
+            break
+
+        positions[movable, 0] += total_x[movable]
+        positions[movable, 1] += total_y[movable]
+
+    return positions
+
+
+def place_branch(tree, index, angle, radius, level_spacing, branch_angle):
+    # وضع فرع وأبنائه على زوايا ومسافات ثابتة حول الأب
+    stack = [(index, angle, radius)]
+    while stack:
+        node, angle, radius = stack.pop()
+        # تقليل المسافة تدريجياً مع زيادة المستوى
+        level_factor = 1 - (tree.level[node] * 0.1)
+        adjusted_radius = radius * level_factor
+        parent_x, parent_y = tree.positions[tree.parent[node]]
+        tree.positions[node] = (parent_x + adjusted_radius * math.cos(angle),
+                                parent_y + adjusted_radius * math.sin(angle))
+
+        children = tree.children(node)
+        if children:
+            child_angle_range = math.radians(branch_angle)
+            child_radius = level_spacing * level_factor
+            for i, child in enumerate(children):
+                child_angle = angle - (child_angle_range/2) + (child_angle_range * (i+1)/(len(children)+1))
+                stack.append((child, child_angle, child_radius))
+
+
+def radial_layout(tree, initial_radius, level_spacing, branch_angle):
+    if not len(tree):
+        return
+    tree.positions[0] = (0, 0)
+    branches = tree.children(0)
+    for i, branch in enumerate(branches):
+        # توزيع الفروع بشكل دائري
+        angle = math.radians(i * 360 / len(branches))
+        place_branch(tree, branch, angle, initial_radius, level_spacing, branch_angle)
+
+
+def relax_tree(tree, min_distance, damping=0.6, iterations=50):
+    # تحسين التخطيط على النموذج مباشرة مع تثبيت المركز
+    if len(tree) > 1:
+        tree.positions[:len(tree)] = relax_positions(
+            tree.positions[:len(tree)], min_distance, damping, iterations, fixed=[0])
+
+
+def layout_children(tree):
+    # قوائم الأبناء الظاهرين، فما تحت العقد المطوية لا يدخل في التخطيط
+    children = [[] for _ in range(len(tree))]
+    parents = tree.parent[:len(tree)]
+    collapsed = tree.collapsed[:len(tree)]
+    for child in range(1, len(tree)):
+        parent = parents[child]
+        if parent >= 0 and not collapsed[parent]:
+            children[parent].append(child)
+    return children
+
+
+def walker(root, children, breadth, gap):
+    # خوارزمية Walker بصيغة Buchheim الخطية، مع أحجام حقيقية للعقد
+    # تعيد موقع كل عقدة على محور العرض وعمقها بالنسبة للجذر
+    count = len(breadth)
+    prelim = np.zeros(count)
+    mod = np.zeros(count)
+    shift = np.zeros(count)
+    change = np.zeros(count)
+    thread = [-1] * count
+    ancestor = list(range(count))
+    number = [0] * count
+    parent_of = {}
+    left_sibling = {}
+
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        kids = children[node]
+        for i, child in enumerate(kids):
+            number[child] = i + 1
+            parent_of[child] = node
+            left_sibling[child] = kids[i - 1] if i else -1
+        # الأبناء بترتيبهم فيكون عكس القائمة ترتيباً لاحقاً من اليسار إلى اليمين
+        stack.extend(kids)
+
+    def next_left(v):
+        kids = children[v]
+        return kids[0] if kids else thread[v]
+
+    def next_right(v):
+        kids = children[v]
+        return kids[-1] if kids else thread[v]
+
+    def distance(left, right):
+        return (breadth[left] + breadth[right]) / 2 + gap
+
+    def move_subtree(left, right, amount):
+        subtrees = number[right] - number[left]
+        change[right] -= amount / subtrees
+        shift[right] += amount
+        change[left] += amount / subtrees
+        prelim[right] += amount
+        mod[right] += amount
+
+    def apportion(v, default_ancestor):
+        w = left_sibling.get(v, -1)
+        if w < 0:
+            return default_ancestor
+        vir = vor = v
+        vil = w
+        vol = children[parent_of[v]][0]
+        sir = sor = mod[vir]
+        sil = mod[vil]
+        sol = mod[vol]
+        while next_right(vil) >= 0 and next_left(vir) >= 0:
+            vil = next_right(vil)
+            vir = next_left(vir)
+            vol = next_left(vol)
+            vor = next_right(vor)
+            ancestor[vor] = v
+            amount = (prelim[vil] + sil) - (prelim[vir] + sir) + distance(vil, vir)
+            if amount > 0:
+                candidate = ancestor[vil]
+                if parent_of.get(candidate) != parent_of[v]:
+                    candidate = default_ancestor
+                move_subtree(candidate, v, amount)
+                sir += amount
+                sor += amount
+            sil += mod[vil]
+            sir += mod[vir]
+            sol += mod[vol]
+            sor += mod[vor]
+        if next_right(vil) >= 0 and next_right(vor) < 0:
+            thread[vor] = next_right(vil)
+            mod[vor] += sil - sor
+        if next_left(vir) >= 0 and next_left(vol) < 0:
+            thread[vol] = next_left(vir)
+            mod[vol] += sir - sol
+            default_ancestor = v
+        return default_ancestor
+
+    # المرور الأول من الأوراق إلى الجذر
+    default_ancestors = {}
+    for v in reversed(order):
+        kids = children[v]
+        w = left_sibling.get(v, -1)
+        if kids:
+            total_shift = total_change = 0.0
+            for child in reversed(kids):
+                prelim[child] += total_shift
+                mod[child] += total_shift
+                total_change += change[child]
+                total_shift += shift[child] + total_change
+            midpoint = (prelim[kids[0]] + prelim[kids[-1]]) / 2
+            if w >= 0:
+                prelim[v] = prelim[w] + distance(w, v)
+                mod[v] = prelim[v] - midpoint
+            else:
+                prelim[v] = midpoint
+        elif w >= 0:
+            prelim[v] = prelim[w] + distance(w, v)
+        if v != root:
+            parent = parent_of[v]
+            default_ancestors[parent] = apportion(v, default_ancestors.get(parent, children[parent][0]))
+
+    # المرور الثاني: المواقع النهائية والأعماق
+    offsets = {}
+    depths = {}
+    stack = [(root, -prelim[root], 0)]
+    while stack:
+        v, m, depth = stack.pop()
+        offsets[v] = prelim[v] + m
+        depths[v] = depth
+        for child in children[v]:
+            stack.append((child, m + mod[v], depth + 1))
+    return offsets, depths
+
+
+def depth_positions(depths, extent, gap):
+    # موقع كل مستوى على محور العمق حسب أكبر عقدة فيه
+    levels = {}
+    for node, depth in depths.items():
+        levels[depth] = max(levels.get(depth, 0), extent[node])
+    positions = {}
+    offset = 0.0
+    for depth in range(len(levels)):
+        if depth:
+            offset += (levels[depth - 1] + levels[depth]) / 2 + gap
+        positions[depth] = offset
+    return positions
+
+
+def follow_collapsed(tree, old_positions):
+    # ما تحت العقد المطوية يتحرك مع عقدته محتفظاً بشكله، والعقد المطوية داخل فرع مطوي
+    # تتحرك مع الفرع الأعلى فقط حتى لا تُزاح مرتين
+    top = tree.collapsed[:len(tree)] & ~tree.hidden_mask()[:len(tree)]
+    for index in np.nonzero(top)[0]:
+        dx, dy = tree.positions[index] - old_positions[index]
+        descendants = tree.subtree(int(index))[1:]
+        tree.positions[descendants] += (dx, dy)
+
+
+def tidy_layout(tree, sizes, level_gap=80, sibling_gap=30, direction='down'):
+    # شجرة مرتبة من الأعلى إلى الأسفل، أو من اليسار إلى اليمين
+    if not len(tree):
+        return
+    old_positions = tree.positions[:len(tree)].copy()
+    breadth_axis = 0 if direction == 'down' else 1
+    breadth = sizes[:, breadth_axis]
+    extent = sizes[:, 1 - breadth_axis]
+    offsets, depths = walker(0, layout_children(tree), breadth, sibling_gap)
+    levels = depth_positions(depths, extent, level_gap)
+    for node, offset in offsets.items():
+        tree.positions[node, breadth_axis] = offset
+        tree.positions[node, 1 - breadth_axis] = levels[depths[node]]
+    follow_collapsed(tree, old_positions)
+
+
+def subtree_weights(order, children):
+    # عدد الأوراق في كل شجرة فرعية، ويُحسب من الأوراق صعوداً
+    weights = {}
+    for v in reversed(order):
+        weights[v] = sum(weights[child] for child in children[v]) or 1
+    return weights
+
+
+def radial_tree_layout(tree, sizes, level_gap=120, sibling_gap=30):
+    # شجرة دائرية يأخذ فيها كل فرع قطاعاً زاوياً بحسب عدد أوراقه
+    if not len(tree):
+        return
+    old_positions = tree.positions[:len(tree)].copy()
+    children = layout_children(tree)
+    order = []
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(reversed(children[node]))
+    weights = subtree_weights(order, children)
+
+    # القطاعات من الجذر إلى الأوراق
+    angles = {0: 0.0}
+    sectors = {0: 2 * math.pi}
+    depths = {0: 0}
+    for v in order:
+        start = angles[v] - sectors[v] / 2
+        total = weights[v]
+        for child in children[v]:
+            sector = sectors[v] * weights[child] / total
+            angles[child] = start + sector / 2
+            sectors[child] = sector
+            depths[child] = depths[v] + 1
+            start += sector
+
+    # نصف قطر كل حلقة يكفي لفصلها عن السابقة ولعدم تداخل العقد على محيطها
+    widths = sizes[:, 0]
+    heights = sizes[:, 1]
+    radial = {}
+    required = {}
+    for v in order[1:]:
+        cos_a = abs(math.cos(angles[v]))
+        sin_a = abs(math.sin(angles[v]))
+        depth = depths[v]
+        radial[depth] = max(radial.get(depth, 0), widths[v] * cos_a + heights[v] * sin_a)
+        tangent = widths[v] * sin_a + heights[v] * cos_a + sibling_gap
+        required[depth] = max(required.get(depth, 0), tangent / max(sectors[v], 1e-9))
+    radius = {0: 0.0}
+    previous = max(widths[0], heights[0])
+    for depth in range(1, len(radial) + 1):
+        ring = radius[depth - 1] + (previous + radial[depth]) / 2 + level_gap
+        radius[depth] = max(ring, required[depth])
+        previous = radial[depth]
+
+    tree.positions[0] = (0, 0)
+    for v in order[1:]:
+        r = radius[depths[v]]
+        tree.positions[v] = (r * math.cos(angles[v]), r * math.sin(angles[v]))
+    follow_collapsed(tree, old_positions)
+
+
+def balanced_layout(tree, sizes, level_gap=100, sibling_gap=25):
+    # خريطة ذهنية متوازنة: الفروع الرئيسية موزعة يميناً ويساراً بحسب حجمها
+    if not len(tree):
+        return
+    old_positions = tree.positions[:len(tree)].copy()
+    children = layout_children(tree)
+    branches = children[0]
+    heights = sizes[:, 1]
+    widths = sizes[:, 0]
+
+    # وزن كل فرع تقريبياً بمجموع ارتفاعات أوراقه
+    order = []
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(reversed(children[node]))
+    weight = {}
+    for v in reversed(order):
+        weight[v] = sum(weight[child] for child in children[v]) or heights[v] + sibling_gap
+
+    # الفروع الأولى يميناً حتى نصف الوزن الكلي، مع الحفاظ على ترتيبها
+    total = sum(weight[branch] for branch in branches)
+    right = []
+    accumulated = 0.0
+    for branch in branches:
+        if not right or accumulated + weight[branch] / 2 <= total / 2:
+            right.append(branch)
+            accumulated += weight[branch]
+        else:
+            break
+    left = branches[len(right):]
+
+    tree.positions[0] = (0, 0)
+    for side, sign in ((right, 1), (left, -1)):
+        if not side:
+            continue
+        children[0] = side
+        offsets, depths = walker(0, children, heights, sibling_gap)
+        levels = depth_positions(depths, widths, level_gap)
+        for node, offset in offsets.items():
+            if node:
+                tree.positions[node] = (sign * levels[depths[node]], offset)
+    children[0] = branches
+    follow_collapsed(tree, old_positions)
+
+
+LAYOUTS = {
+    'tidy': tidy_layout,
+    'radial': radial_tree_layout,
+    'balanced': balanced_layout,
+}
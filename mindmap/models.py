@@ -1,113 +1,337 @@
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
+from collections import OrderedDict
+from functools import lru_cache
 import math
+from .profiler import profiler
+
+# ألوان المستويات مشتركة بين كل العقد
+LEVEL_COLORS = [
+    QColor("#1E88E5"),  # المركز
+    QColor("#43A047"),  # الفروع الرئيسية
+    QColor("#FB8C00"),  # الفروع الفرعية
+    QColor("#8E24AA")   # التفاصيل
+]
+HOVER_COLOR = QColor("#64B5F6")
+TEXT_COLOR = QColor("#FFFFFF")
+LINE_PEN = QPen(QColor("#90A4AE"), 2, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+LINE_SHADOW_PEN = QPen(QColor(0, 0, 0, 30), 3, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin)
+# إطار نتيجة البحث، يُرسم داخل حدود العقدة
+HIGHLIGHT_PEN = QPen(QColor("#FFD600"), 4)
+
+
+_font_metrics = {}
+
+
+@lru_cache(maxsize=65536)
+def node_size(text, level):
+    # حجم المربع وحده دون بناء النمط كاملاً، لحساب الحدود والتخطيط
+    metrics = _font_metrics.get(level)
+    if metrics is None:
+        metrics = _font_metrics[level] = QFontMetrics(QFont("Arial", 12 - level))
+    # تحسين حجم المربعات للنصوص العربية
+    width = max(150, metrics.width(text) + 60)
+    height = max(80, metrics.height() * 2 + 30)
+    return width, height
+
+
+@lru_cache(maxsize=None)
+def level_font(level):
+    font = QFont("Arial", 12 - level)
+    font.setBold(True)
+    return font
+
+
+@lru_cache(maxsize=1024)
+def node_fill(color, width, height):
+    # التدرج بإحداثيات العقدة يتكرر لكل العقد بالحجم واللون نفسيهما
+    color = QColor(color)
+    gradient = QLinearGradient(-width/2, -height/2, width/2, height/2)
+    gradient.setColorAt(0, color.lighter(120))
+    gradient.setColorAt(1, color)
+    return QBrush(gradient), QPen(color.darker(120), 2)
+
+
+TEXT_PEN = QPen(TEXT_COLOR)
+
+
+class NodeStyle:
+    # الحجم وتخطيط النص والفرش المحسوبة مسبقاً لكل (نص، مستوى)
+    __slots__ = ('text', 'rect', 'bounds', 'font', 'text_rect', 'static_text', 'text_pos',
+                 'color', 'brush', 'pen', 'hover_brush', 'hover_pen', 'text_pen')
+
+    def __init__(self, text, level):
+        width, height = node_size(text, level)
+        self.text = text
+        self.rect = QRectF(-width/2, -height/2, width, height)
+        # هامش لنصف عرض الحد حتى لا تبقى آثار عند التحديث الجزئي
+        self.bounds = self.rect.adjusted(-1, -1, 1, 1)
+
+        # تحسين عرض النص
+        self.font = level_font(level)
+        self.text_rect = self.rect.adjusted(15, 10, -15, -10)
+        # تخطيط النص يُحضَّر عند أول رسم، فالعقد التي لا تظهر بالتفاصيل الكاملة لا تدفع كلفته
+        self.static_text = None
+        self.text_pos = None
+
+        # الخلفية مع التدرج، مشتركة بين الأنماط المتساوية في الحجم
+        self.color = color = LEVEL_COLORS[min(level, len(LEVEL_COLORS)-1)]
+        self.brush, self.pen = node_fill(color.rgba(), width, height)
+        self.hover_brush, self.hover_pen = node_fill(HOVER_COLOR.rgba(), width, height)
+        self.text_pen = TEXT_PEN
+
+    def text_layout(self):
+        if self.static_text is None:
+            text_rect = self.text_rect
+            option = QTextOption(Qt.AlignCenter)
+            option.setWrapMode(QTextOption.WordWrap)
+            static_text = QStaticText(self.text)
+            static_text.setTextWidth(text_rect.width())
+            static_text.setTextOption(option)
+            static_text.setPerformanceHint(QStaticText.AggressiveCaching)
+            static_text.prepare(QTransform(), self.font)
+            self.text_pos = QPointF(text_rect.left(),
+                                    text_rect.center().y() - static_text.size().height() / 2)
+            self.static_text = static_text
+        return self.static_text, self.text_pos
+
+
+_style_cache = OrderedDict()
+STYLE_CACHE_SIZE = 4096
+
+
+def node_style(text, level):
+    key = (text, level)
+    style = _style_cache.get(key)
+    if style is None:
+        style = NodeStyle(text, level)
+        _style_cache[key] = style
+        if len(_style_cache) > STYLE_CACHE_SIZE:
+            _style_cache.popitem(last=False)
+    else:
+        _style_cache.move_to_end(key)
+    return style
+
 
 class Node(QGraphicsItem):
+    colors = LEVEL_COLORS
+
+    # حدود مستوى التفاصيل حسب مقياس العرض
+    LOD_SIMPLIFIED = 0.5
+    LOD_DOT = 0.2
+    # نصف قطر النقطة بالبكسل على الشاشة
+    DOT_RADIUS = 3
+
     def __init__(self, text, level=0, parent=None):
         super().__init__(parent)
-        self.text = text
-        self.level = level
+        self._text = text
+        self._level = level
+        self._style = node_style(text, level)
+        # فهرس العقدة في نموذج الشجرة الذي تعرضه
+        self.index = None
         self.connections = []
-        self.children = []
-        self.setFlag(QGraphicsItem.ItemIsMovable)
-        self.setFlag(QGraphicsItem.ItemIsSelectable)
-        self.setFlag(QGraphicsItem.ItemSendsGeometryChanges)
+        self._expandable = False
+        # صورة مصغرة للشجرة الفرعية المطوية تُرسم تحت العقدة
+        self._summary = None
+        self._bounds = self._style.bounds
+        # الأعلام دفعة واحدة، فكل تغيير لها يمر عبر itemChange
+        self.setFlags(QGraphicsItem.ItemIsMovable | QGraphicsItem.ItemIsSelectable |
+                      QGraphicsItem.ItemSendsGeometryChanges)
         self.setAcceptHoverEvents(True)
-        
-        # تحسين الألوان وإضافة تدرجات
-        self.colors = [
-            QColor("#1E88E5"),  # المركز
-            QColor("#43A047"),  # الفروع الرئيسية
-            QColor("#FB8C00"),  # الفروع الفرعية
-            QColor("#8E24AA")   # التفاصيل
-        ]
-        self._hover_color = QColor("#64B5F6")
-        self._text_color = QColor("#FFFFFF")
         self._is_hovered = False
-        
+        self._highlighted = False
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        if text != self._text:
+            self._set_style(text, self._level)
+
+    @property
+    def level(self):
+        return self._level
+
+    @level.setter
+    def level(self, level):
+        if level != self._level:
+            self._set_style(self._text, level)
+
+    @property
+    def expandable(self):
+        # عقدة يمكن جلب أبنائها عند الطلب
+        return self._expandable
+
+    @expandable.setter
+    def expandable(self, expandable):
+        if expandable != self._expandable:
+            self._expandable = expandable
+            self.update()
+
+    @property
+    def highlighted(self):
+        return self._highlighted
+
+    @highlighted.setter
+    def highlighted(self, highlighted):
+        if highlighted != self._highlighted:
+            self._highlighted = highlighted
+            self.update()
+
+    @property
+    def summary(self):
+        return self._summary
+
+    @summary.setter
+    def summary(self, pixmap):
+        if pixmap is not self._summary:
+            self.prepareGeometryChange()
+            self._summary = pixmap
+            self._update_bounds()
+            self.update()
+
+    def summary_rect(self):
+        rect = self._style.rect
+        size = self._summary.size()
+        return QRectF(-size.width() / 2, rect.bottom() + 6, size.width(), size.height())
+
+    def bind(self, index, text, level):
+        # إعادة استخدام العنصر لعقدة أخرى من النموذج
+        self.index = index
+        if text != self._text or level != self._level:
+            self._set_style(text, level)
+        self.summary = None
+        self._expandable = False
+        self._is_hovered = False
+        self._highlighted = False
+
+    def _set_style(self, text, level):
+        self.prepareGeometryChange()
+        self._text = text
+        self._level = level
+        self._style = node_style(text, level)
+        self._update_bounds()
+        self.update()
+
+    def _update_bounds(self):
+        if self._summary is None:
+            self._bounds = self._style.bounds
+        else:
+            self._bounds = self._style.bounds.united(self.summary_rect())
+
     def boundingRect(self):
-        # تحسين حجم المربعات للنصوص العربية
-        fm = QFontMetrics(QFont("Arial", 12 - self.level))
-        width = max(150, fm.width(self.text) + 60)
-        height = max(80, fm.height() * 2 + 30)
-        return QRectF(-width/2, -height/2, width, height)
-        
+        return self._bounds
+
     def paint(self, painter, option, widget):
+        if profiler.enabled:
+            profiler.count('Node.paint')
+        style = self._style
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod < self.LOD_SIMPLIFIED:
+            self.paint_simplified(painter, style, lod)
+            return
+
         painter.setRenderHint(QPainter.Antialiasing)
-        
-        # إضافة تأثير الظل
-        shadow = QGraphicsDropShadowEffect()
-        shadow.setBlurRadius(10)
-        shadow.setOffset(3, 3)
-        shadow.setColor(QColor(0, 0, 0, 50))
-        
-        # رسم الخلفية مع التدرج
-        color = self.colors[min(self.level, len(self.colors)-1)]
+
         if self._is_hovered:
-            color = self._hover_color
-            
-        gradient = QLinearGradient(self.boundingRect().topLeft(), 
-                                 self.boundingRect().bottomRight())
-        gradient.setColorAt(0, color.lighter(120))
-        gradient.setColorAt(1, color)
-        
-        rect = self.boundingRect()
-        painter.setBrush(QBrush(gradient))
-        painter.setPen(QPen(color.darker(120), 2))
-        painter.drawRoundedRect(rect, 15, 15)
-        
-        # تحسين عرض النص
-        font = QFont("Arial", 12 - self.level)
-        font.setBold(True)
-        painter.setFont(font)
-        painter.setPen(QPen(self._text_color))
-        text_rect = rect.adjusted(15, 10, -15, -10)
-        painter.drawText(text_rect, Qt.AlignCenter | Qt.TextWordWrap, self.text)
+            painter.setBrush(style.hover_brush)
+            painter.setPen(style.hover_pen)
+        else:
+            painter.setBrush(style.brush)
+            painter.setPen(style.pen)
+        painter.drawRoundedRect(style.rect, 15, 15)
+        if self._highlighted:
+            painter.setBrush(Qt.NoBrush)
+            painter.setPen(HIGHLIGHT_PEN)
+            painter.drawRoundedRect(style.rect.adjusted(2, 2, -2, -2), 13, 13)
+
+        painter.setFont(style.font)
+        painter.setPen(style.text_pen)
+        static_text, text_pos = style.text_layout()
+        painter.drawStaticText(text_pos, static_text)
+        if self._expandable:
+            painter.drawText(style.rect.adjusted(0, 4, -10, 0), Qt.AlignRight | Qt.AlignTop, "+")
+        if self._summary is not None:
+            painter.drawPixmap(self.summary_rect().topLeft(), self._summary)
+
+    def paint_simplified(self, painter, style, lod):
+        # عند التصغير الشديد يكفي مستطيل مسطح، ثم نقطة صغيرة بحجم ثابت على الشاشة
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        color = HOVER_COLOR if self._is_hovered else style.color
+        if self._highlighted:
+            color = HIGHLIGHT_PEN.color()
+        if lod < self.LOD_DOT:
+            radius = min(self.DOT_RADIUS / max(lod, 1e-6), style.rect.height() / 2)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(color)
+            painter.drawEllipse(QPointF(0, 0), radius, radius)
+            return
+        painter.fillRect(style.rect, color)
+        if self._summary is not None:
+            painter.drawPixmap(self.summary_rect().topLeft(), self._summary)
+
+        painter.setFont(style.font)
+        painter.setPen(style.text_pen)
+        painter.drawText(style.text_rect, Qt.AlignCenter, self._text)
+
+    def itemChange(self, change, value):
+        # إبلاغ المشهد بتحرك العقدة لتحديث النموذج وخطوطها فقط
+        if change == QGraphicsItem.ItemPositionHasChanged:
+            scene = self.scene()
+            if scene is not None and hasattr(scene, 'node_moved'):
+                scene.node_moved(self)
+        return super().itemChange(change, value)
 
 class Connection(QGraphicsLineItem):
     def __init__(self, startNode, endNode):
         super().__init__()
-        self.startNode = startNode
-        self.endNode = endNode
-        self.startNode.connections.append(self)
-        self.endNode.connections.append(self)
+        self.startNode = None
+        self.endNode = None
+        self._bounds = QRectF()
         
         # تحسين شكل الخطوط
-        self.setPen(QPen(QColor("#90A4AE"), 2, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+        self.setPen(LINE_PEN)
         self.setZValue(-1)
         
-        # إضافة تأثير الظل للخطوط
-        shadow = QGraphicsDropShadowEffect()
-        shadow.setBlurRadius(5)
-        shadow.setOffset(2, 2)
-        shadow.setColor(QColor(0, 0, 0, 30))
-        self.setGraphicsEffect(shadow)
-        
+        # الظل يُرسم مباشرة كخط مزاح بدلاً من QGraphicsDropShadowEffect
+        # الذي يرسم كل خط في صورة وسيطة بحجم مستطيله
+        self.bind(startNode, endNode)
+
+    def setLine(self, line):
+        super().setLine(line)
+        self._bounds = super().boundingRect().adjusted(-1, -1, 3, 3)
+
+    def boundingRect(self):
+        return self._bounds
+
+    def paint(self, painter, option, widget=None):
+        if profiler.enabled:
+            profiler.count('Connection.paint')
+        if option.levelOfDetailFromTransform(painter.worldTransform()) >= Node.LOD_SIMPLIFIED:
+            painter.setPen(LINE_SHADOW_PEN)
+            painter.drawLine(self.line().translated(2, 2))
+        super().paint(painter, option, widget)
+
+    def bind(self, startNode, endNode):
+        self.startNode = startNode
+        self.endNode = endNode
+        self.startNode.connections.append(self)
+        self.endNode.connections.append(self)
         self.updatePosition()
+
+    def unbind(self):
+        for node in (self.startNode, self.endNode):
+            if node is not None and self in node.connections:
+                node.connections.remove(self)
+        self.startNode = None
+        self.endNode = None
         
     def updatePosition(self):
         if not self.startNode or not self.endNode:
             return
             
-        # إنشاء خط منحني بين العقد
-        path = QPainterPath()
-        start_pos = self.startNode.pos()
-        end_pos = self.endNode.pos()
-        
-        # نقاط التحكم للمنحنى
-        ctrl1 = QPointF(
-            start_pos.x() + (end_pos.x() - start_pos.x()) * 0.4,
-            start_pos.y() + (end_pos.y() - start_pos.y()) * 0.1
-        )
-        ctrl2 = QPointF(
-            start_pos.x() + (end_pos.x() - start_pos.x()) * 0.6,
-            end_pos.y() - (end_pos.y() - start_pos.y()) * 0.1
-        )
-        
-        path.moveTo(start_pos)
-        path.cubicTo(ctrl1, ctrl2, end_pos)
-        
-        # تحويل المسار إلى خط
-        line = QLineF(start_pos, end_pos)
+        line = QLineF(self.startNode.pos(), self.endNode.pos())
         self.setLine(line)
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+
+# قياس الأداء: مدد المراحل وعدادات لكل إطار، وتصديرها بصيغة Chrome trace
+_NULL_SPAN = nullcontext()
+
+class Span:
+    __slots__ = ('profiler', 'name', 'args', 'start')
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.profiler.add_span(self.name, self.start, end, self.args)
+        return False
+
+class Profiler:
+    def __init__(self, max_events=200000, frame_history=120):
+        # معطل افتراضياً، وكل نقطة قياس تفحص هذه القيمة فقط
+        self.enabled = False
+        self.origin = time.perf_counter()
+        self.events = deque(maxlen=max_events)
+        self.counters = {}
+        self.totals = {}
+        # مدة كل إطار ووقت انتهائه لحساب عدد الإطارات في الثانية
+        self.frames = deque(maxlen=frame_history)
+        self.frame_counters = {}
+        self._lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.origin = time.perf_counter()
+            self.events.clear()
+            self.counters.clear()
+            self.totals.clear()
+            self.frames.clear()
+            self.frame_counters = {}
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, args)
+
+    def add_span(self, name, start, end, args=None):
+        event = {'name': name, 'ph': 'X', 'ts': (start - self.origin) * 1e6,
+                 'dur': (end - start) * 1e6, 'pid': os.getpid(), 'tid': threading.get_ident()}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.events.append(event)
+            count, total = self.totals.get(name, (0, 0.0))
+            self.totals[name] = (count + 1, total + end - start)
+
+    def count(self, name, value=1):
+        # العدادات تُجمع للإطار الحالي وتُصفّر في نهايته
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def end_frame(self, start, end, **gauges):
+        # إنهاء إطار: حفظ مدته وعداداته وتسجيلها كحدث عداد في التتبع
+        if not self.enabled:
+            return
+        with self._lock:
+            counters = self.counters
+            self.counters = {}
+            counters.update(gauges)
+            self.frames.append((end, end - start))
+            self.frame_counters = counters
+        self.add_span('frame', start, end)
+        if counters:
+            with self._lock:
+                self.events.append({'name': 'frame', 'ph': 'C', 'ts': (end - self.origin) * 1e6,
+                                    'pid': os.getpid(), 'args': counters})
+
+    def fps(self, window=1.0):
+        if not self.frames:
+            return 0.0
+        latest = self.frames[-1][0]
+        recent = [frame for frame in self.frames if latest - frame[0] <= window]
+        if len(recent) < 2:
+            return len(recent) / window
+        return (len(recent) - 1) / max(recent[-1][0] - recent[0][0], 1e-6)
+
+    def frame_time(self):
+        return self.frames[-1][1] if self.frames else 0.0
+
+    def summary(self):
+        # المدة الكلية وعدد الاستدعاءات لكل مرحلة
+        with self._lock:
+            return {name: {'calls': count, 'total': total, 'mean': total / count}
+                    for name, (count, total) in self.totals.items()}
+
+    def chrome_trace(self):
+        with self._lock:
+            events = list(self.events)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, file_name):
+        # يُفتح في chrome://tracing أو Perfetto
+        with open(file_name, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False)
+        return len(self.events)
+
+profiler = Profiler()
+
+def traced(name):
+    # تغليف دالة بمرحلة مسماة، وعند التعطيل يكلف فحصاً واحداً فقط
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            with Span(profiler, name, None):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
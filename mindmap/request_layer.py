@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .stats import percentile
+
+# رموز HTTP وأسماء الأخطاء التي تستحق إعادة المحاولة
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+TRANSIENT_NAMES = {'ServiceUnavailable', 'TooManyRequests', 'ResourceExhausted', 'DeadlineExceeded',
+                   'InternalServerError', 'BadGateway', 'GatewayTimeout', 'RetryError'}
+
+class RequestTimeout(TimeoutError):
+    pass
+
+def is_transient(error):
+    # الأخطاء المؤقتة فقط تُعاد، أما خطأ المفتاح أو الطلب فيظهر مباشرة
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, 'code', None)
+    if isinstance(code, int) and code in TRANSIENT_STATUS:
+        return True
+    return type(error).__name__ in TRANSIENT_NAMES
+
+class RequestLayer:
+    # حول كل طلب للنموذج: مهلة كلية، إعادة مع تراجع أسي عشوائي، طلب احتياطي، ودمج الطلبات المتطابقة
+    def __init__(self, timeout=60.0, attempts=3, attempt_timeout=None, backoff=0.5,
+                 max_backoff=8.0, hedge_after=None, max_workers=16, history=1000):
+        self.timeout = timeout
+        self.attempts = max(1, attempts)
+        # مهلة المحاولة الواحدة، فالمحاولة البطيئة تُترك وتُعاد ما دامت المهلة الكلية تسمح
+        self.attempt_timeout = attempt_timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # إرسال نسخة ثانية من الطلب إذا تأخر الرد، وأخذ أول رد ناجح
+        self.hedge_after = hedge_after
+        # محدد معدل اختياري بدالة acquire()، يُستدعى قبل كل محاولة وكل طلب احتياطي
+        self.limiter = None
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mindmap-request')
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(('requests', 'succeeded', 'failed', 'attempts', 'retries',
+                                       'timeouts', 'hedges', 'hedge_wins', 'coalesced'), 0)
+        self.latencies = deque(maxlen=history)
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def coalesce(self, key, function):
+        # الطلبات الجارية بالمفتاح نفسه تنتظر نتيجة الطلب الأول بدلاً من إرسال طلب جديد
+        if key is None:
+            return function()
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.counters['coalesced'] += 1
+        if not owner:
+            return future.result()
+        try:
+            result = function()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def execute(self, function):
+        # function(timeout) تُستدعى لكل محاولة بالوقت المتبقي من المهلة
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = 0.0
+        self._count('requests')
+        for attempt in range(self.attempts):
+            # انتظار حد الطلبات لا يُحسب من المهلة ولا من زمن الاستجابة
+            wait = self._acquire()
+            deadline += wait
+            waited += wait
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if attempt:
+                self._count('retries')
+            try:
+                result = self._attempt(function, min(remaining, self.attempt_timeout or remaining))
+            except Exception as e:
+                if isinstance(e, TimeoutError):
+                    self._count('timeouts')
+                if not is_transient(e) or attempt == self.attempts - 1:
+                    self._count('failed')
+                    raise
+                # تراجع أسي بعشوائية كاملة حتى لا تتزامن إعادات العملاء
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                if time.monotonic() + delay >= deadline:
+                    self._count('failed')
+                    raise
+                time.sleep(delay)
+                continue
+            self._count('succeeded')
+            with self._lock:
+                self.latencies.append(time.monotonic() - start - waited)
+            return result
+        self._count('failed')
+        raise RequestTimeout(f"AI request exceeded its {self.timeout:.0f}s budget")
+
+    def _attempt(self, function, timeout):
+        deadline = time.monotonic() + timeout
+        self._count('attempts')
+        primary = self._pool.submit(function, timeout)
+        futures = {primary}
+        if self.hedge_after is not None and self.hedge_after < timeout:
+            done, _ = wait(futures, timeout=self.hedge_after)
+            if not done:
+                self._count('hedges')
+                self._acquire()
+                futures.add(self._pool.submit(function, deadline - time.monotonic()))
+
+        error = None
+        while futures:
+            done, futures = wait(futures, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                # لا يمكن قطع الطلب الجاري، فتُترك نتيجته عند وصولها
+                raise RequestTimeout(f"AI request did not answer within {timeout:.1f}s")
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is not primary:
+                    self._count('hedge_wins')
+                return result
+        raise error
+
+    def _acquire(self):
+        if self.limiter is None:
+            return 0.0
+        start = time.monotonic()
+        self.limiter.acquire()
+        return time.monotonic() - start
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self.counters)
+            latencies = list(self.latencies)
+        metrics.update({
+            'latency_p50': percentile(latencies, 50),
+            'latency_p90': percentile(latencies, 90),
+            'latency_p99': percentile(latencies, 99),
+            'latency_max': max(latencies, default=0.0),
+        })
+        return metrics
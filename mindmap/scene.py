@@ -1,10 +1,19 @@
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
-from .models import Node, Connection
+from .models import Node, Connection, LEVEL_COLORS, LINE_PEN, node_size
+from .layout import LAYOUTS, place_branch, radial_layout, relax_tree
+from .tree import MindMapTree
+from .profiler import traced
+from .search import SearchIndex
+from .json_parser import JSONParser, ParseReport
+from PyQt5 import sip
+import numpy as np
 import math
 
 class MindMapScene(QGraphicsScene):
+    expandRequested = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
         self.setSceneRect(-2000, -2000, 4000, 4000)
@@ -16,101 +25,646 @@ class MindMapScene(QGraphicsScene):
         self.min_node_distance = 250     # الحد الأدنى للمسافة بين العقد
         self.sibling_spacing = 300       # المسافة بين العقد الشقيقة
         self.branch_angle = 60           # زاوية توزيع الفروع
+        # نمط التخطيط: radial أو balanced أو tidy، وclassic للزوايا الثابتة مع التحسين
+        self.layout_mode = 'radial'
         
         self.root_node = None
+        self.tree = None
+        self.nodes = []
+        self.streaming = False
+        self._streamed_angles = []
+        # في الوضع التدريجي تُجلب أبناء الأوراق عند الطلب
+        self.expandable_leaves = False
+        self._pending_expansions = {}
 
-    def create_from_json(self, data):
-        self.clear()
-        self.root_node = Node(data['center'], 0)
-        self.addItem(self.root_node)
-        self.root_node.setPos(0, 0)
-        
-        if 'branches' in data:
-            branches = data['branches']
-            # توزيع الفروع بشكل دائري
-            angle_step = 360 / len(branches)
-            
-            for i, branch_data in enumerate(branches):
-                angle = math.radians(i * angle_step)
-                # استخدام المسافة الأساسية للمستوى الأول
-                self.create_branch(self.root_node, branch_data, angle, self.initial_radius, 1)
-        
-        self.optimize_layout()
+        # الوضع الافتراضي: إنشاء عناصر رسومية للعقد الظاهرة فقط
+        self.virtualize_threshold = 2000
+        self.virtual_margin = 500
+        self.virtual = False
+        self.edges = {}
+        self._materialized = set()
+        self._viewport_rect = None
+        self._node_pool = []
+        self._edge_pool = []
+        self.pool_size = 4096
+        # الدفعات الأكبر من هذا تُبنى مع إيقاف فهرس المشهد
+        self.bulk_threshold = 256
+
+        # الفروع المطوية: العقد المخفية وحدود كل فرع مطوي وصورته المصغرة
+        self.hidden = np.zeros(0, dtype=bool)
+        self._subtree_bounds = {}
+        self._summaries = {}
+        self.summary_size = QSize(140, 70)
+
+        # فهرس البحث في نصوص العقد، والعقدة المميزة بنتيجة البحث
+        self.search_index = SearchIndex()
+        self._highlighted = None
+
+        # سجل التعديلات للاستعادة بعد الانهيار، اختياري
+        self.journal = None
+        self._syncing = False
+
+        # تجميع تحديثات الخطوط وتنفيذها مرة واحدة لكل إطار
+        self._dirty_connections = set()
+        self._connection_timer = QTimer(self)
+        self._connection_timer.setSingleShot(True)
+        self._connection_timer.setInterval(16)
+        self._connection_timer.timeout.connect(self.flush_connection_updates)
+
+    @traced('scene.create_from_json')
+    def create_from_json(self, data, expandable=False):
+        tree = MindMapTree.from_json(data)
+        # التخطيط يتم على النموذج قبل إنشاء أي عنصر رسومي
+        self.apply_layout(tree)
+        self.load_tree(tree, expandable)
+
+    @traced('scene.apply_layout')
+    def apply_layout(self, tree):
+        if self.layout_mode == 'classic':
+            radial_layout(tree, self.initial_radius, self.level_spacing, self.branch_angle)
+            relax_tree(tree, self.min_node_distance)
+        else:
+            LAYOUTS[self.layout_mode](tree, self.node_sizes(tree))
+
+    def node_sizes(self, tree):
+        # الأحجام الحقيقية للعقد كما في boundingRect، مع الصورة المصغرة تحت العقد المطوية
+        sizes = np.array([node_size(tree.text(index), int(tree.level[index]))
+                          for index in range(len(tree))], dtype=np.float64).reshape(-1, 2)
+        sizes[tree.collapsed[:len(tree)], 1] += self.summary_size.height() + 6
+        return sizes
+
+    def set_layout(self, mode):
+        if mode != 'classic' and mode not in LAYOUTS:
+            raise ValueError(f"Unknown layout: {mode}")
+        self.layout_mode = mode
+        if self.tree is not None and not self.streaming:
+            if mode == 'classic':
+                radial_layout(self.tree, self.initial_radius, self.level_spacing, self.branch_angle)
+            self.relayout()
+
+    def relayout(self):
+        # التخطيطات المرتبة خطية ولا تحتاج تمرير التنافر
+        if self.layout_mode == 'classic':
+            self.optimize_layout()
+            return
+        self.apply_layout(self.tree)
+        self.sync_positions(range(len(self.tree)))
         self.update_all_connections()
+        self.checkpoint()
 
-    def create_branch(self, parent_node, branch_data, angle, radius, level):
-        branch_node = Node(branch_data['text'], level)
-        self.addItem(branch_node)
-        
-        # حساب موقع العقدة مع مراعاة المستوى
-        level_factor = 1 - (level * 0.1)  # تقليل المسافة تدريجياً مع زيادة المستوى
-        adjusted_radius = radius * level_factor
-        
-        x = parent_node.pos().x() + adjusted_radius * math.cos(angle)
-        y = parent_node.pos().y() + adjusted_radius * math.sin(angle)
-        branch_node.setPos(x, y)
-        
-        connection = self.create_curved_connection(parent_node, branch_node)
+    def clear(self):
+        super().clear()
+        self.root_node = None
+        self.tree = None
+        self.nodes = []
+        self.edges = {}
+        self._materialized = set()
+        self.hidden = np.zeros(0, dtype=bool)
+        self._subtree_bounds = {}
+        self._summaries = {}
+        self.search_index.clear()
+        self._highlighted = None
+        self.streaming = False
+        self._dirty_connections.clear()
+        self._pending_expansions.clear()
+
+    @traced('scene.load_tree')
+    def load_tree(self, tree, expandable=False, virtual=None, checkpoint=True):
+        self.clear()
+        self.expandable_leaves = expandable
+        self.tree = tree
+        self.nodes = [None] * len(tree)
+        self.hidden = tree.hidden_mask()
+        self.search_index.build(tree)
+        self.virtual = len(tree) > self.virtualize_threshold if virtual is None else virtual
+        self.update_scene_rect()
+        self.create_items(range(len(tree)))
+        self.root_node = self.nodes[0] if self.nodes else None
+        if checkpoint:
+            self.checkpoint()
+
+    def checkpoint(self):
+        # لقطة كاملة في السجل بعد التغييرات الكبيرة بدلاً من تسجيل كل عقدة
+        if self.journal is not None and self.tree is not None:
+            self.journal.snapshot(self.tree, self.expandable_leaves)
+
+    def journal_edit(self, op, **fields):
+        if self.journal is None or self.streaming:
+            return
+        self.journal.record(op, **fields)
+        if self.journal.needs_compaction():
+            self.checkpoint()
+
+    def create_items(self, indices):
+        # العناصر الرسومية مجرد عرض للنموذج
+        tree = self.tree
+        if len(self.nodes) < len(tree):
+            first = len(self.nodes)
+            self.nodes.extend([None] * (len(tree) - first))
+            # العقد الجديدة تُخفى إذا أضيفت تحت فرع مطوي أو مخفي
+            hidden = np.zeros(len(tree), dtype=bool)
+            hidden[:first] = self.hidden[:first]
+            for index in range(first, len(tree)):
+                parent = tree.parent[index]
+                hidden[index] = parent >= 0 and (hidden[parent] or tree.collapsed[parent])
+            self.hidden = hidden
+            self.search_index.add_range(tree, first, len(tree))
+        if self.virtual:
+            self.update_scene_rect()
+            self.refresh_viewport()
+            return
+
+        self.bulk_materialize([index for index in indices if not self.hidden[index]])
+
+    def bulk_materialize(self, indices):
+        # إنشاء دفعة من العناصر: العقد أولاً ثم الخطوط من مواقعها النهائية مرة واحدة،
+        # مع إيقاف فهرس المشهد أثناء الإضافة وإعادة بنائه مرة واحدة في النهاية
+        bulk = len(indices) >= self.bulk_threshold
+        if bulk:
+            self.setItemIndexMethod(QGraphicsScene.NoIndex)
+        try:
+            for index in indices:
+                self.materialize(index)
+            for index in indices:
+                self.materialize_edges(index)
+        finally:
+            if bulk:
+                self.setItemIndexMethod(QGraphicsScene.BspTreeIndex)
+
+    def materialize(self, index):
+        tree = self.tree
+        text = tree.text(index)
+        level = int(tree.level[index])
+        if self._node_pool:
+            node = self._node_pool.pop()
+            node.bind(index, text, level)
+        else:
+            node = Node(text, level)
+            node.index = index
+        node.setPos(*tree.position(index))
+        if self.expandable_leaves and index and tree.is_leaf(index):
+            node.expandable = True
+        if tree.collapsed[index]:
+            node.summary = self.subtree_summary(index)
+        if index == self._highlighted:
+            node.highlighted = True
+        self.addItem(node)
+        self.nodes[index] = node
+        self._materialized.add(index)
+        return node
+
+    def materialize_edges(self, index):
+        # ربط العقدة بأبيها وبأبنائها الموجودين كعناصر
+        parent = self.tree.parent[index]
+        if parent >= 0 and index not in self.edges and self.nodes[parent] is not None:
+            self.create_edge(index)
+        if self.virtual:
+            for child in self.tree.children(index):
+                if child not in self.edges and self.nodes[child] is not None:
+                    self.create_edge(child)
+
+    def create_edge(self, child):
+        start = self.nodes[self.tree.parent[child]]
+        end = self.nodes[child]
+        if self._edge_pool:
+            connection = self._edge_pool.pop()
+            connection.bind(start, end)
+        else:
+            connection = Connection(start, end)
         self.addItem(connection)
-        
-        # معالجة العقد الفرعية
-        if 'children' in branch_data and branch_data['children']:
-            children = branch_data['children']
-            # تعديل زاوية توزيع الأطفال
-            child_angle_range = math.radians(self.branch_angle)
-            child_radius = self.level_spacing * level_factor
-            
-            # توزيع العقد الفرعية
-            for i, child_data in enumerate(children):
-                child_angle = angle - (child_angle_range/2) + (child_angle_range * (i+1)/(len(children)+1))
-                self.create_branch(branch_node, child_data, child_angle, child_radius, level + 1)
+        self.edges[child] = connection
+
+    def release(self, index):
+        node = self.nodes[index]
+        for connection in list(node.connections):
+            self.release_edge(connection)
+        self.removeItem(node)
+        self.nodes[index] = None
+        self._materialized.discard(index)
+        if len(self._node_pool) < self.pool_size:
+            self._node_pool.append(node)
+
+    def release_edge(self, connection):
+        self.edges.pop(connection.endNode.index, None)
+        self._dirty_connections.discard(connection)
+        connection.unbind()
+        self.removeItem(connection)
+        if len(self._edge_pool) < self.pool_size:
+            self._edge_pool.append(connection)
+
+    def item_counts(self):
+        # عدد العقد في النموذج والعناصر الرسومية الموجودة فعلاً
+        return {'model_nodes': len(self.tree) if self.tree is not None else 0,
+                'node_items': len(self._materialized), 'edge_items': len(self.edges)}
+
+    def map_bounds(self):
+        # حدود الخريطة من النموذج، مع هامش تقريبي لحجم العقد
+        if self.tree is None or not len(self.tree):
+            return self.itemsBoundingRect()
+        positions = self.tree.positions[:len(self.tree)]
+        left, top = positions.min(axis=0)
+        right, bottom = positions.max(axis=0)
+        return QRectF(QPointF(left, top), QPointF(right, bottom)).adjusted(-300, -100, 300, 100)
+
+    def update_scene_rect(self):
+        self.setSceneRect(QRectF(-2000, -2000, 4000, 4000).united(self.map_bounds().adjusted(-1000, -1000, 1000, 1000)))
+
+    def set_viewport_rect(self, rect):
+        self._viewport_rect = QRectF(rect)
+        if self.virtual:
+            self.refresh_viewport()
+
+    def visible_indices(self, rect):
+        tree = self.tree
+        rect = rect.adjusted(-self.virtual_margin, -self.virtual_margin,
+                             self.virtual_margin, self.virtual_margin)
+        positions = tree.positions[:len(tree)]
+        # عقدة ظاهرة إذا كانت هي أو الخط الواصل إلى أبيها يتقاطع مع المنطقة
+        parent_positions = positions[np.maximum(tree.parent[:len(tree)], 0)]
+        low = np.minimum(positions, parent_positions)
+        high = np.maximum(positions, parent_positions)
+        mask = ((high[:, 0] >= rect.left()) & (low[:, 0] <= rect.right()) &
+                (high[:, 1] >= rect.top()) & (low[:, 1] <= rect.bottom()) &
+                ~self.hidden)
+        visible = np.nonzero(mask)[0]
+        # الآباء أيضاً حتى تظهر الخطوط الداخلة إلى المنطقة
+        parents = tree.parent[visible]
+        wanted = set(visible.tolist())
+        wanted.update(parents[parents >= 0].tolist())
+        wanted.add(0)
+        return wanted
+
+    def refresh_viewport(self, rect=None):
+        if self.tree is None or not len(self.tree):
+            return
+        rect = rect or self._viewport_rect or QRectF(-2000, -2000, 4000, 4000)
+        wanted = self.visible_indices(rect)
+
+        # العقد المحددة أو المسحوبة تبقى حتى لو خرجت من العرض
+        grabber = self.mouseGrabberItem()
+        for index in self._materialized - wanted:
+            node = self.nodes[index]
+            if node is grabber or node.isSelected():
+                continue
+            self.release(index)
+
+        self.bulk_materialize(list(wanted - self._materialized))
+
+    def node_moved(self, node):
+        tree = self.tree
+        if tree is not None and node.index is not None:
+            index = node.index
+            x, y = node.pos().x(), node.pos().y()
+            # الفرع المطوي يتحرك مع عقدته دون إنشاء عناصره
+            dx, dy = tree.move_node(index, x, y)
+            bounds = self._subtree_bounds.get(index)
+            if bounds is not None:
+                self._subtree_bounds[index] = bounds.translated(dx, dy)
+            if not self._syncing and (dx or dy):
+                self.journal_edit('move', index=int(index), x=x, y=y)
+        self.schedule_connection_update(node)
+
+    def rename_node(self, index, text):
+        self.tree.set_text(index, text)
+        self.search_index.update(index, text)
+        node = self.nodes[index]
+        if node is not None:
+            node.text = text
+        self.journal_edit('text', index=int(index), text=text)
+
+    def insert_child(self, parent, text):
+        tree = self.tree
+        child = tree.add_node(text, parent)
+        self.place_children(parent, [child], len(tree.children(parent)) - 1)
+        self.create_items([child])
+        if self.layout_mode != 'classic':
+            # إعادة التخطيط تكتب لقطة كاملة في السجل فلا حاجة لتسجيل الإضافة
+            self.relayout()
+            return child
+        x, y = tree.position(child)
+        self.journal_edit('insert', parent=int(parent), text=text, x=x, y=y)
+        return child
+
+    def delete_subtree(self, index):
+        # الحذف يعيد ترقيم العقد، فيُعاد بناء العرض من النموذج الجديد
+        if index <= 0:
+            return
+        self.load_tree(self.tree.remove_subtree(index), self.expandable_leaves, checkpoint=False)
+        self.journal_edit('delete', index=int(index))
+
+    def search(self, query, limit=20):
+        return self.search_index.search(query, limit)
+
+    def reveal(self, index):
+        # فتح الفروع المطوية فوق العقدة ثم تمييزها، وإرجاع موقعها بعد أي إعادة تخطيط
+        tree = self.tree
+        ancestors = []
+        parent = tree.parent[index]
+        while parent >= 0:
+            ancestors.append(parent)
+            parent = tree.parent[parent]
+        for ancestor in reversed(ancestors):
+            if tree.collapsed[ancestor]:
+                self.expand(ancestor)
+        self.set_highlight(index)
+        return QPointF(*tree.position(index))
+
+    def set_highlight(self, index):
+        previous = self._highlighted
+        if previous is not None and previous < len(self.nodes) and self.nodes[previous] is not None:
+            self.nodes[previous].highlighted = False
+        self._highlighted = index
+        if index is not None and self.nodes[index] is not None:
+            self.nodes[index].highlighted = True
+
+    def is_collapsed(self, index):
+        return bool(self.tree.collapsed[index])
+
+    def toggle_collapsed(self, index):
+        if self.tree.collapsed[index]:
+            self.expand(index)
+        else:
+            self.collapse(index)
+
+    def collapse(self, index):
+        # إخفاء الشجرة الفرعية وإزالة عناصرها من فهرس المشهد، فيبقى عنصر واحد للفرع
+        tree = self.tree
+        if tree.collapsed[index] or tree.is_leaf(index):
+            return
+        descendants = tree.shown_subtree(index)[1:]
+        tree.collapsed[index] = True
+        self.hidden[descendants] = True
+        for child in descendants:
+            if self.nodes[child] is not None:
+                self.release(child)
+        node = self.nodes[index]
+        if node is not None:
+            node.summary = self.subtree_summary(index)
+        self.journal_edit('collapse', index=int(index), collapsed=True)
 
+    def expand(self, index):
+        # إظهار ما كان ظاهراً قبل الطي فقط، والفروع المطوية داخله تبقى مطوية
+        tree = self.tree
+        if not tree.collapsed[index]:
+            return
+        tree.collapsed[index] = False
+        descendants = tree.shown_subtree(index)[1:]
+        self.hidden[descendants] = False
+        self.journal_edit('collapse', index=int(index), collapsed=False)
+        node = self.nodes[index]
+        if node is not None:
+            node.summary = None
+        if self.virtual:
+            self.refresh_viewport()
+            return
+        self.bulk_materialize(descendants)
+
+    def collapse_all(self, level=1):
+        # طي كل الفروع عند مستوى معين
+        tree = self.tree
+        if tree is None:
+            return
+        levels = tree.level[:len(tree)]
+        for index in np.nonzero(levels == level)[0].tolist():
+            if not self.hidden[index]:
+                self.collapse(index)
+
+    def expand_all(self):
+        tree = self.tree
+        if tree is None:
+            return
+        for index in np.nonzero(tree.collapsed[:len(tree)])[0].tolist():
+            if not self.hidden[index]:
+                self.expand(index)
+
+    def subtree_bounds(self, index):
+        # حدود الشجرة الفرعية بما فيها أحجام العقد، تُحسب مرة لكل فرع مطوي
+        bounds = self._subtree_bounds.get(index)
+        if bounds is None:
+            tree = self.tree
+            indices = tree.subtree(index)
+            sizes = np.array([node_size(tree.text(child), int(tree.level[child])) for child in indices])
+            positions = tree.positions[indices]
+            left, top = (positions - sizes / 2).min(axis=0)
+            right, bottom = (positions + sizes / 2).max(axis=0)
+            bounds = QRectF(QPointF(left, top), QPointF(right, bottom))
+            self._subtree_bounds[index] = bounds
+        return bounds
+
+    def subtree_summary(self, index):
+        pixmap = self._summaries.get(index)
+        if pixmap is None:
+            pixmap = self.render_summary(index)
+            self._summaries[index] = pixmap
+        return pixmap
+
+    def render_summary(self, index):
+        # صورة مصغرة لشكل الفرع المطوي مع عدد عقده المخفية
+        tree = self.tree
+        indices = tree.subtree(index)
+        bounds = self.subtree_bounds(index)
+        pixmap = QPixmap(self.summary_size)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(QColor("#B0BEC5"), 1))
+        painter.setBrush(QColor(255, 255, 255, 220))
+        frame = QRectF(pixmap.rect()).adjusted(0.5, 0.5, -0.5, -0.5)
+        painter.drawRoundedRect(frame, 8, 8)
+
+        area = frame.adjusted(8, 6, -8, -20)
+        scale = min(area.width() / max(bounds.width(), 1), area.height() / max(bounds.height(), 1))
+        offset_x = area.center().x() - bounds.center().x() * scale
+        offset_y = area.center().y() - bounds.center().y() * scale
+        points = tree.positions[indices] * scale + (offset_x, offset_y)
+        position = dict(zip(indices, points.tolist()))
+
+        painter.setPen(QPen(LINE_PEN.color(), 1))
+        for child in indices[1:]:
+            painter.drawLine(QPointF(*position[tree.parent[child]]), QPointF(*position[child]))
+        painter.setPen(Qt.NoPen)
+        for child in indices:
+            painter.setBrush(LEVEL_COLORS[min(int(tree.level[child]), len(LEVEL_COLORS)-1)])
+            painter.drawEllipse(QPointF(*position[child]), 2.5, 2.5)
+
+        painter.setPen(QColor("#546E7A"))
+        painter.setFont(QFont("Arial", 8))
+        painter.drawText(frame.adjusted(0, 0, 0, -4), Qt.AlignHCenter | Qt.AlignBottom,
+                         f"+{len(indices) - 1}")
+        painter.end()
+        return pixmap
+
+    def invalidate_summaries(self):
+        # إعادة التخطيط تبطل حدود الفروع المطوية وصورها
+        self._subtree_bounds = {}
+        self._summaries = {}
+        for index in np.nonzero(self.tree.collapsed[:len(self.tree)])[0].tolist():
+            node = self.nodes[index]
+            if node is not None:
+                node.summary = self.subtree_summary(index)
+
+    def node_path(self, node):
+        return self.tree.path(node.index)
+
+    def request_expansion(self, node):
+        path = self.node_path(node)
+        self._pending_expansions[path] = node
+        self.expandRequested.emit(path)
+
+    def apply_expansion(self, path, children):
+        node = self._pending_expansions.pop(tuple(path), None)
+        if node is None or sip.isdeleted(node) or node.scene() is not self:
+            return
+        node.expandable = False
+        if not children:
+            return
+
+        tree = self.tree
+        index = node.index
+        first = len(tree)
+        added = tree.add_children(index, children)
+        self.place_children(index, added)
+        self.create_items(range(first, len(tree)))
+        if self.layout_mode != 'classic':
+            self.relayout()
+            return
+        self.journal_edit('subtree', parent=int(index), children=children,
+                          positions=tree.positions[first:len(tree)].tolist())
+
+    def place_children(self, index, added, start=0):
+        # توزيع الأبناء في اتجاه الفرع بعيداً عن أبيه
+        tree = self.tree
+        parent = tree.parent[index]
+        origin_x, origin_y = tree.position(parent) if parent >= 0 else (0, 0)
+        node_x, node_y = tree.position(index)
+        angle = math.atan2(node_y - origin_y, node_x - origin_x)
+        child_angle_range = math.radians(self.branch_angle)
+        child_radius = self.level_spacing * (1 - (tree.level[index] * 0.1))
+        count = start + len(added)
+        for i, child in enumerate(added, start):
+            child_angle = angle - (child_angle_range/2) + (child_angle_range * (i+1)/(count+1))
+            place_branch(tree, child, child_angle, child_radius, self.level_spacing, self.branch_angle)
+
+    def mouseDoubleClickEvent(self, event):
+        item = self.itemAt(event.scenePos(), QTransform())
+        if isinstance(item, Node) and item.expandable:
+            self.request_expansion(item)
+            return
+        if isinstance(item, Node) and item.index and not self.tree.is_leaf(item.index):
+            self.toggle_collapsed(item.index)
+            return
+        super().mouseDoubleClickEvent(event)
+
+    def keyPressEvent(self, event):
+        # تحرير العقدة المحددة: F2 لتغيير النص، Insert لإضافة ابن، Delete لحذف الفرع
+        selected = [item for item in self.selectedItems() if isinstance(item, Node)]
+        if self.tree is None or len(selected) != 1 or self.streaming:
+            super().keyPressEvent(event)
+            return
+        index = selected[0].index
+        parent = self.views()[0] if self.views() else None
+        if event.key() == Qt.Key_F2:
+            text, ok = QInputDialog.getText(parent, "Edit Node", "Text:", text=self.tree.text(index))
+            if ok and text.strip():
+                self.rename_node(index, text.strip())
+        elif event.key() == Qt.Key_Insert:
+            text, ok = QInputDialog.getText(parent, "Add Node", "Text:")
+            if ok and text.strip():
+                self.insert_child(index, text.strip())
+        elif event.key() == Qt.Key_Delete and index:
+            self.delete_subtree(index)
+        else:
+            super().keyPressEvent(event)
+
+    def begin_streaming(self, center_text):
+        tree = MindMapTree()
+        tree.add_node(center_text)
+        self.load_tree(tree)
+        self.streaming = True
+        self._streamed_angles = []
+
+    def add_streamed_branch(self, branch_data):
+        if not self.streaming or self.root_node is None:
+            return
+        # استثناء داخل دالة مربوطة بإشارة Qt يُنهي التطبيق، فالفرع غير الصالح يُتجاهل
+        branches = JSONParser._validate_nodes([branch_data], ParseReport())
+        if not branches:
+            return
+        branch_data = branches[0]
+
+        tree = self.tree
+        count = len(self._streamed_angles) + 1
+        angle = math.radians((count - 1) * 360 / count)
+        first = len(tree)
+        branch = tree.add_children(0, [branch_data])[0]
+        place_branch(tree, branch, angle, self.initial_radius, self.level_spacing, self.branch_angle)
+        self.create_items(range(first, len(tree)))
+        self._streamed_angles.append(angle)
+
+        # إعادة توزيع الفروع السابقة بالتساوي حول المركز
+        for i, branch in enumerate(tree.children(0)):
+            target = math.radians(i * 360 / count)
+            delta = target - self._streamed_angles[i]
+            if delta:
+                self.rotate_subtree(branch, delta)
+                self._streamed_angles[i] = target
+
+    def abort_streaming(self):
+        # بعد الإلغاء أو الفشل تبقى الفروع التي وصلت خريطة عادية قابلة للتعديل والاستعادة
+        if not self.streaming:
+            return
+        self.streaming = False
+        self._streamed_angles = []
+        self.checkpoint()
+
+    def finish_streaming(self, data):
+        # الاكتفاء بتحسين التخطيط إذا وصلت كل الفروع أثناء البث
+        complete = (self.root_node is not None
+                    and self.root_node.text == data.get('center')
+                    and len(self.tree.children(0)) == len(data.get('branches') or []))
+        self.streaming = False
+        if complete:
+            self.relayout()
+        else:
+            self.create_from_json(data)
+
+    def rotate_subtree(self, index, angle):
+        tree = self.tree
+        indices = tree.subtree(index)
+        center = tree.positions[0]
+        offsets = tree.positions[indices] - center
+        cos_a = math.cos(angle)
+        sin_a = math.sin(angle)
+        tree.positions[indices, 0] = center[0] + offsets[:, 0] * cos_a - offsets[:, 1] * sin_a
+        tree.positions[indices, 1] = center[1] + offsets[:, 0] * sin_a + offsets[:, 1] * cos_a
+        self.sync_positions(indices)
 
+    def sync_positions(self, indices):
+        # نقل المواقع من النموذج إلى العناصر الرسومية
+        self._syncing = True
+        try:
+            for index in indices:
+                node = self.nodes[index]
+                if node is not None:
+                    node.setPos(*self.tree.position(index))
+        finally:
+            self._syncing = False
+        if self._summaries or self._subtree_bounds:
+            self.invalidate_summaries()
+        if self.virtual:
+            self.update_scene_rect()
+            self.refresh_viewport()
+
+    @traced('scene.optimize_layout')
     def optimize_layout(self):
-        iterations = 50
-        damping = 0.6  # معامل تخميد للحركة
-        
-        for _ in range(iterations):
-            moved = False
-            for item1 in self.items():
-                if not isinstance(item1, Node):
-                    continue
-                
-                total_force_x = 0
-                total_force_y = 0
-                
-                for item2 in self.items():
-                    if not isinstance(item2, Node) or item1 == item2:
-                        continue
-                    
-                    pos1 = item1.pos()
-                    pos2 = item2.pos()
-                    dx = pos2.x() - pos1.x()
-                    dy = pos2.y() - pos1.y()
-                    distance = math.sqrt(dx*dx + dy*dy)
-                    
-                    # تطبيق قوة التنافر عندما تكون المسافة أقل من الحد الأدنى
-                    if distance < self.min_node_distance:
-                        force = self.min_node_distance - distance
-                        angle = math.atan2(dy, dx)
-                        force_x = -force * math.cos(angle) * damping
-                        force_y = -force * math.sin(angle) * damping
-                        
-                        total_force_x += force_x
-                        total_force_y += force_y
-                        moved = True
-                
-                # تطبيق القوة الإجمالية
-                if item1 != self.root_node and moved:
-                    new_x = pos1.x() + total_force_x
-                    new_y = pos1.y() + total_force_y
-                    item1.setPos(new_x, new_y)
-            
-            if not moved:
-                break
-        
-        self.update_all_connections()
+        if self.tree is None:
+            return
+        relax_tree(self.tree, self.min_node_distance)
 
+        # كتابة المواقع الجديدة إلى العقد مرة واحدة في النهاية
+        self.sync_positions(range(len(self.tree)))
+        self.update_all_connections()
+        self.checkpoint()
 
     def organize_branches(self, parent_node, branches_data, level=1):
         if not branches_data:
@@ -159,61 +713,34 @@ class MindMapScene(QGraphicsScene):
                 self.organize_children(child_node, child_data['children'], level + 1)
 
     def create_curved_connection(self, start_node, end_node):
-        connection = Connection(start_node, end_node)
-        self.update_connection_position(connection)
-        return connection
+        # الخط يُحسب عند الربط في Connection
+        return Connection(start_node, end_node)
 
     def update_connection_position(self, connection):
         if not connection.startNode or not connection.endNode:
             return
-        
-        start_pos = connection.startNode.pos()
-        end_pos = connection.endNode.pos()
-        
-        # تحسين شكل الخط
-        dx = end_pos.x() - start_pos.x()
-        dy = end_pos.y() - start_pos.y()
-        distance = math.sqrt(dx*dx + dy*dy)
-        
-        # إنشاء منحنى جميل
-        mid_x = (start_pos.x() + end_pos.x()) / 2
-        mid_y = (start_pos.y() + end_pos.y()) / 2
-        
-        # حساب نقطة التحكم للمنحنى
-        angle = math.atan2(dy, dx)
-        curve_strength = distance * 0.2
-        
-        control_point = QPointF(
-            mid_x + curve_strength * math.cos(angle + math.pi/2),
-            mid_y + curve_strength * math.sin(angle + math.pi/2)
-        )
-        
-        # تحديث الخط
-        line = QLineF(start_pos, end_pos)
-        connection.setLine(line)
-        
-        # تحسين مظهر الخط
-        pen = QPen(QColor("#90A4AE"), 2, Qt.SolidLine)
-        pen.setCapStyle(Qt.RoundCap)
-        pen.setJoinStyle(Qt.RoundJoin)
-        connection.setPen(pen)
 
+        # القلم ثابت ويُضبط عند إنشاء الخط، لذا يكفي تحديث الإحداثيات
+        connection.setLine(QLineF(connection.startNode.pos(), connection.endNode.pos()))
+
+    def schedule_connection_update(self, node):
+        self._dirty_connections.update(node.connections)
+        if not self._connection_timer.isActive():
+            self._connection_timer.start()
+
+    def flush_connection_updates(self):
+        dirty = self._dirty_connections
+        self._dirty_connections = set()
+        for connection in dirty:
+            if connection.scene() is self:
+                self.update_connection_position(connection)
+
+    @traced('scene.update_all_connections')
     def update_all_connections(self):
+        self._dirty_connections.clear()
         for item in self.items():
             if isinstance(item, Connection):
                 self.update_connection_position(item)
-                
-    def mousePressEvent(self, event):
-        super().mousePressEvent(event)
-        self.update_all_connections()
-
-    def mouseReleaseEvent(self, event):
-        super().mouseReleaseEvent(event)
-        self.update_all_connections()
-
-    def mouseMoveEvent(self, event):
-        super().mouseMoveEvent(event)
-        self.update_all_connections()
 
     def wheelEvent(self, event):
         # تحسين التكبير/التصغير
@@ -0,0 +1,163 @@
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left
+
+# حروف تُوحَّد بعد حذف التشكيل: التاء المربوطة والألف المقصورة والألف الوصلية والتطويل
+_LETTERS = str.maketrans({'ة': 'ه', 'ى': 'ي', 'ٱ': 'ا', 'ـ': None})
+_WORD = re.compile(r'\w+')
+
+def normalize_text(text):
+    # NFKD ثم حذف العلامات المركبة يزيل التشكيل والهمزات فوق الحروف ونبرات اللاتينية
+    text = text.casefold()
+    if text.isascii():
+        return text
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return unicodedata.normalize('NFKC', text).translate(_LETTERS)
+
+def tokenize(text):
+    return list(dict.fromkeys(_WORD.findall(normalize_text(text))))
+
+def trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+class SearchIndex:
+    # فهرس مقلوب من الكلمات إلى العقد، وفهرس ثلاثيات من الحروف إلى الكلمات للبحث داخل الكلمة
+    def __init__(self, max_candidates=2000):
+        self.entries = {}
+        self.postings = {}
+        self.grams = {}
+        self.vocabulary = []
+        self._known = set()
+        self._vocabulary_sorted = True
+        # حد العقد المفحوصة للاستعلامات التي تطابق معظم الخريطة
+        self.max_candidates = max_candidates
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.postings.clear()
+        self.grams.clear()
+        self.vocabulary = []
+        self._known = set()
+        self._vocabulary_sorted = True
+
+    def build(self, tree):
+        self.clear()
+        self.add_range(tree, 0, len(tree))
+
+    def add_range(self, tree, first, last):
+        levels = tree.level
+        for index in range(first, last):
+            self.add(index, tree.text(index), int(levels[index]))
+
+    def add(self, index, text, level=0):
+        if index in self.entries:
+            self.remove(index)
+        normalized = normalize_text(text)
+        tokens = tuple(dict.fromkeys(_WORD.findall(normalized)))
+        self.entries[index] = (normalized, tokens, level)
+        postings = self.postings
+        for token in tokens:
+            posting = postings.get(token)
+            if posting is None:
+                posting = postings[token] = {}
+                self._add_token(token)
+            posting[index] = None
+
+    def remove(self, index):
+        entry = self.entries.pop(index, None)
+        if entry is None:
+            return
+        for token in entry[1]:
+            posting = self.postings[token]
+            posting.pop(index, None)
+            # الكلمة تبقى في المفردات والثلاثيات وتُتجاهل حتى تعود
+            if not posting:
+                del self.postings[token]
+
+    def update(self, index, text, level=None):
+        if level is None:
+            level = self.entries[index][2] if index in self.entries else 0
+        self.add(index, text, level)
+
+    def _add_token(self, token):
+        if token in self._known:
+            return
+        self._known.add(token)
+        self.vocabulary.append(token)
+        self._vocabulary_sorted = False
+        for gram in trigrams(token):
+            self.grams.setdefault(gram, set()).add(token)
+
+    def matching_tokens(self, term):
+        # (جودة التطابق، الكلمة): 0 كلمة مطابقة، 1 بداية كلمة، 2 داخل كلمة
+        postings = self.postings
+        matches = [(0, term)] if term in postings else []
+        if len(term) >= 3:
+            sets = sorted((self.grams.get(gram, set()) for gram in trigrams(term)), key=len)
+            candidates = sets[0].intersection(*sets[1:]) if sets else set()
+            for token in candidates:
+                if token != term and term in token and token in postings:
+                    matches.append((1 if token.startswith(term) else 2, token))
+        else:
+            # الكلمات القصيرة جداً تُطابق كبداية كلمة فقط
+            if not self._vocabulary_sorted:
+                self.vocabulary.sort()
+                self._vocabulary_sorted = True
+            vocabulary = self.vocabulary
+            position = bisect_left(vocabulary, term)
+            while position < len(vocabulary) and vocabulary[position].startswith(term):
+                token = vocabulary[position]
+                if token != term and token in postings:
+                    matches.append((1, token))
+                position += 1
+        matches.sort(key=lambda match: (match[0], len(match[1])))
+        return matches
+
+    def search(self, query, limit=20):
+        # كل كلمات الاستعلام يجب أن تظهر، والترتيب حسب جودة التطابق ثم المستوى ثم طول النص
+        terms = tokenize(query)
+        if not terms:
+            return []
+        matched = []
+        for term in terms:
+            tokens = self.matching_tokens(term)
+            if not tokens:
+                return []
+            matched.append((term, tokens))
+        # الكلمة الأندر تولّد المرشحين والباقي يُفحص في نص العقدة
+        if len(matched) > 1:
+            matched.sort(key=lambda item: sum(len(self.postings[token]) for _, token in item[1]))
+        driver = matched[0][1]
+        others = [term for term, _ in matched[1:]]
+
+        # الكلمات المطابقة مرتبة من الأفضل، فيتوقف الفحص حين تكفي النتائج ولا يبقى إلا الأسوأ
+        scores = {}
+        group = None
+        for token_quality, token in driver:
+            rank = (token_quality, len(token))
+            if rank != group and len(scores) >= limit:
+                break
+            group = rank
+            for index in self.postings[token]:
+                if index in scores:
+                    continue
+                normalized, tokens, level = self.entries[index]
+                score = token_quality
+                for term in others:
+                    if term in tokens:
+                        continue
+                    if term not in normalized:
+                        break
+                    score += 1 if any(word.startswith(term) for word in tokens) else 2
+                else:
+                    scores[index] = (score, len(token), level, len(normalized), index)
+                    if len(scores) >= self.max_candidates:
+                        break
+            if len(scores) >= self.max_candidates:
+                break
+        return [index for index, _ in heapq.nsmallest(limit, scores.items(), key=lambda item: item[1])]
@@ -0,0 +1,7 @@
+def percentile(values, p):
+    # أقرب قيمة للنسبة المئوية المطلوبة، و0 عند عدم وجود قيم
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,211 @@
+import numpy as np
+
+class MindMapTree:
+    # نموذج مضغوط للخريطة في مصفوفات، مستقل عن Qt ويصلح للعمل دون واجهة
+    def __init__(self, capacity=64):
+        self.size = 0
+        self.texts = []
+        self._text_ids = {}
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.level = np.zeros(capacity, dtype=np.int16)
+        self.text_id = np.zeros(capacity, dtype=np.int32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.last_child = np.full(capacity, -1, dtype=np.int32)
+        self.next_sibling = np.full(capacity, -1, dtype=np.int32)
+        self.collapsed = np.zeros(capacity, dtype=bool)
+        self.positions = np.zeros((capacity, 2), dtype=np.float64)
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        capacity = len(self.parent) * 2
+        for name, fill in (('parent', -1), ('level', 0), ('text_id', 0),
+                           ('first_child', -1), ('last_child', -1), ('next_sibling', -1),
+                           ('collapsed', False)):
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        positions = np.zeros((capacity, 2), dtype=np.float64)
+        positions[:len(self.positions)] = self.positions
+        self.positions = positions
+
+    def intern(self, text):
+        text_id = self._text_ids.get(text)
+        if text_id is None:
+            text_id = len(self.texts)
+            self.texts.append(text)
+            self._text_ids[text] = text_id
+        return text_id
+
+    def add_node(self, text, parent=-1, x=0.0, y=0.0):
+        if self.size == len(self.parent):
+            self._grow()
+        index = self.size
+        self.size += 1
+
+        self.text_id[index] = self.intern(text)
+        self.parent[index] = parent
+        self.positions[index] = (x, y)
+        if parent >= 0:
+            self.level[index] = self.level[parent] + 1
+            last = self.last_child[parent]
+            if last < 0:
+                self.first_child[parent] = index
+            else:
+                self.next_sibling[last] = index
+            self.last_child[parent] = index
+        return index
+
+    def add_children(self, parent, children_data):
+        # إضافة أشجار فرعية من بيانات JSON وإرجاع فهارس الأبناء المباشرين
+        added = []
+        stack = [(parent, children_data, added)]
+        while stack:
+            parent_index, items, collected = stack.pop()
+            for item in items:
+                index = self.add_node(item['text'], parent_index)
+                if collected is not None:
+                    collected.append(index)
+                if item.get('children'):
+                    stack.append((index, item['children'], None))
+        return added
+
+    def text(self, index):
+        return self.texts[self.text_id[index]]
+
+    def set_text(self, index, text):
+        self.text_id[index] = self.intern(text)
+
+    def position(self, index):
+        x, y = self.positions[index]
+        return float(x), float(y)
+
+    def set_position(self, index, x, y):
+        self.positions[index, 0] = x
+        self.positions[index, 1] = y
+
+    def move_node(self, index, x, y):
+        # نقل العقدة، والشجرة الفرعية المطوية تتحرك معها لأنها بلا عناصر رسومية
+        dx = x - self.positions[index, 0]
+        dy = y - self.positions[index, 1]
+        if self.collapsed[index]:
+            self.positions[self.subtree(index)] += (dx, dy)
+        else:
+            self.set_position(index, x, y)
+        return dx, dy
+
+    def children(self, index):
+        children = []
+        child = self.first_child[index]
+        while child >= 0:
+            children.append(int(child))
+            child = self.next_sibling[child]
+        return children
+
+    def is_leaf(self, index):
+        return self.first_child[index] < 0
+
+    def subtree(self, index):
+        # فهارس الشجرة الفرعية بترتيب العمق أولاً
+        result = []
+        stack = [index]
+        while stack:
+            node = stack.pop()
+            result.append(node)
+            stack.extend(reversed(self.children(node)))
+        return result
+
+    def shown_subtree(self, index):
+        # الشجرة الفرعية دون ما تحت العقد المطوية
+        result = []
+        stack = [index]
+        while stack:
+            node = stack.pop()
+            result.append(node)
+            if not self.collapsed[node]:
+                stack.extend(reversed(self.children(node)))
+        return result
+
+    def hidden_mask(self):
+        # العقدة مخفية إذا كان أحد أسلافها مطوياً
+        hidden = np.zeros(self.size, dtype=bool)
+        for index in np.nonzero(self.collapsed[:self.size])[0]:
+            hidden[self.subtree(int(index))[1:]] = True
+        return hidden
+
+    def path(self, index):
+        path = []
+        while index >= 0:
+            path.append(self.text(index))
+            index = self.parent[index]
+        return tuple(reversed(path))
+
+    def remove_subtree(self, index):
+        # نموذج جديد دون الشجرة الفرعية، والفهارس الباقية تحتفظ بترتيبها
+        size = self.size
+        keep = np.ones(size, dtype=bool)
+        keep[self.subtree(index)] = False
+        remap = np.cumsum(keep) - 1
+        parent = self.parent[:size][keep]
+        parent = np.where(parent >= 0, remap[parent], -1)
+        return MindMapTree.from_columns(self.texts, parent, self.text_id[:size][keep],
+                                        self.level[:size][keep], self.positions[:size][keep],
+                                        self.collapsed[:size][keep])
+
+    def copy(self):
+        size = self.size
+        return MindMapTree.from_columns(self.texts, self.parent[:size], self.text_id[:size],
+                                        self.level[:size], self.positions[:size],
+                                        self.collapsed[:size])
+
+    @classmethod
+    def from_columns(cls, texts, parent, text_id, level, positions, collapsed=None):
+        # بناء النموذج من أعمدة محفوظة دون إعادة حساب التخطيط
+        size = len(parent)
+        tree = cls(capacity=max(64, size))
+        tree.size = size
+        tree.texts = list(texts)
+        tree._text_ids = {text: i for i, text in enumerate(tree.texts)}
+        tree.parent[:size] = parent
+        tree.text_id[:size] = text_id
+        tree.level[:size] = level
+        tree.positions[:size] = positions
+        if collapsed is not None:
+            tree.collapsed[:size] = collapsed
+
+        # الأبناء يضافون دائماً بعد آبائهم، فترتيب الإخوة هو ترتيب الفهارس
+        children = np.nonzero(tree.parent[:size] >= 0)[0]
+        parents = tree.parent[children]
+        order = np.argsort(parents, kind='stable')
+        children = children[order]
+        parents = parents[order]
+        if len(children):
+            same = parents[1:] == parents[:-1]
+            tree.next_sibling[children[:-1][same]] = children[1:][same]
+            starts = np.concatenate(([True], ~same))
+            ends = np.concatenate((~same, [True]))
+            tree.first_child[parents[starts]] = children[starts]
+            tree.last_child[parents[ends]] = children[ends]
+        return tree
+
+    @classmethod
+    def from_json(cls, data):
+        tree = cls()
+        root = tree.add_node(data['center'])
+        tree.add_children(root, data.get('branches') or [])
+        return tree
+
+    def to_json(self):
+        if not self.size:
+            return {}
+        items = {}
+        for index in range(self.size - 1, 0, -1):
+            item = {'text': self.text(index)}
+            children = [items.pop(child) for child in self.children(index)]
+            if children:
+                item['children'] = children
+            items[index] = item
+        return {'center': self.text(0),
+                'branches': [items.pop(child) for child in self.children(0)]}
@@ -2,21 +2,53 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 from .scene import MindMapScene
-from .config import Config
 from .chat_widget import ChatWidget
+from .export import export_scene, export_bounds, output_size, EXPORT_OPTIONS
+from .document import open_map, save_scene
+from .journal import EditJournal, recover
+from .profiler import profiler
 import json
+import time
 
 class MindMapView(QGraphicsView):
     def __init__(self, scene):
         super().__init__(scene)
         self.setRenderHint(QPainter.Antialiasing)
-        self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+        # إعادة رسم المناطق المتغيرة فقط بدلاً من كامل العرض
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+        self.setOptimizationFlag(QGraphicsView.DontSavePainterState)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
         self.setResizeAnchor(QGraphicsView.AnchorUnderMouse)
         self.setDragMode(QGraphicsView.ScrollHandDrag)
         self.scale(0.8, 0.8)
+        self.horizontalScrollBar().valueChanged.connect(self.viewport_changed)
+        self.verticalScrollBar().valueChanged.connect(self.viewport_changed)
+
+        # طبقة قياس الأداء فوق العرض، معطلة افتراضياً
+        self.overlay_enabled = False
+        self._overlay_timer = QTimer(self)
+        self._overlay_timer.setInterval(500)
+        self._overlay_timer.timeout.connect(self.viewport().update)
+
+    def viewport_changed(self):
+        # إبلاغ المشهد بالمنطقة الظاهرة لإنشاء عناصرها فقط
+        scene = self.scene()
+        if scene is not None and hasattr(scene, 'set_viewport_rect'):
+            scene.set_viewport_rect(self.mapToScene(self.viewport().rect()).boundingRect())
+
+    def scale(self, sx, sy):
+        super().scale(sx, sy)
+        self.viewport_changed()
+
+    def setTransform(self, transform, combine=False):
+        super().setTransform(transform, combine)
+        self.viewport_changed()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.viewport_changed()
 
     def wheelEvent(self, event):
         if event.modifiers() == Qt.ControlModifier:
@@ -25,13 +57,115 @@ class MindMapView(QGraphicsView):
         else:
             super().wheelEvent(event)
 
+    def center_on_node(self, index):
+        scene = self.scene()
+        self.centerOn(scene.reveal(index))
+        # في الوضع الافتراضي تُنشأ العقدة بعد تحريك العرض، فيُعاد تمييزها
+        scene.set_highlight(index)
+
+    def set_overlay(self, enabled):
+        # تفعيل الطبقة يفعّل القياس، والعرض يُعاد رسمه كاملاً حتى تكون مدة الإطار حقيقية
+        self.overlay_enabled = enabled
+        profiler.enable(enabled)
+        if enabled:
+            self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+            self._overlay_timer.start()
+        else:
+            self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+            self._overlay_timer.stop()
+        self.viewport().update()
+
+    def paintEvent(self, event):
+        if not profiler.enabled:
+            super().paintEvent(event)
+            return
+        start = time.perf_counter()
+        super().paintEvent(event)
+        end = time.perf_counter()
+        scene = self.scene()
+        profiler.end_frame(start, end, **(scene.item_counts() if hasattr(scene, 'item_counts') else {}))
+        if self.overlay_enabled:
+            self.draw_overlay()
+
+    def draw_overlay(self):
+        counters = profiler.frame_counters
+        lines = [
+            f"FPS {profiler.fps():.1f}",
+            f"Frame {profiler.frame_time() * 1000:.1f} ms",
+            f"Nodes {counters.get('node_items', 0)} / {counters.get('model_nodes', 0)}",
+            f"Edges {counters.get('edge_items', 0)}",
+            f"Painted {counters.get('Node.paint', 0)} nodes, {counters.get('Connection.paint', 0)} edges",
+        ]
+        painter = QPainter(self.viewport())
+        painter.setFont(QFont("Monospace", 9))
+        metrics = painter.fontMetrics()
+        width = max(metrics.width(line) for line in lines) + 16
+        rect = QRect(8, 8, width, metrics.height() * len(lines) + 12)
+        painter.fillRect(rect, QColor(0, 0, 0, 170))
+        painter.setPen(QColor("#FFFFFF"))
+        for row, line in enumerate(lines):
+            painter.drawText(rect.left() + 8, rect.top() + 6 + metrics.ascent() + row * metrics.height(), line)
+        painter.end()
+
+class ExportOptionsDialog(QDialog):
+    # مقياس التصدير، والدقة لملفات PDF، مع حجم الناتج بالبكسل
+    def __init__(self, fmt, bounds, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export Options")
+        self.bounds = bounds
+        layout = QFormLayout(self)
+
+        self.scale_input = QDoubleSpinBox()
+        self.scale_input.setRange(0.1, 8.0)
+        self.scale_input.setSingleStep(0.5)
+        self.scale_input.setValue(1.0)
+        self.scale_input.setSuffix("x")
+        layout.addRow("Scale:", self.scale_input)
+
+        self.dpi_input = QSpinBox()
+        self.dpi_input.setRange(72, 1200)
+        self.dpi_input.setValue(300)
+        self.dpi_input.setEnabled('dpi' in EXPORT_OPTIONS[fmt])
+        layout.addRow("DPI:", self.dpi_input)
+
+        self.size_label = QLabel()
+        layout.addRow("Size:", self.size_label)
+        self.scale_input.valueChanged.connect(self.update_size)
+        self.update_size()
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def update_size(self):
+        width, height = output_size(self.bounds, self.scale_input.value())
+        self.size_label.setText(f"{width} x {height}")
+
+    def options(self):
+        return {'scale': self.scale_input.value(), 'dpi': self.dpi_input.value()}
+
 class MindMapWindow(QMainWindow):
+    # خطأ من خيط السجل، يصل إلى الخيط الرئيسي عبر الإشارة
+    journalFailed = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
+        self.prefetch_count = 3
+        self.warm_up_delay = 500
+        # آخر مستند فُتح أو حُفظ، ليكون الحفظ التالي تزايدياً في الملف نفسه
+        self.document_path = None
+        self._journal_warned = False
+        self.journalFailed.connect(self.onJournalFailed)
+        self.journal = EditJournal(on_error=lambda error: self.journalFailed.emit(str(error)))
         self.initUI()
-        config = Config()
-        load_api_key = config.load_api_key
-        
+        self.scene.journal = self.journal
+        # عرض الاستعادة بعد ظهور النافذة
+        if self.journal.has_recovery():
+            QTimer.singleShot(0, self.offerRecovery)
+        # تحميل مكتبة النموذج بعد أول رسم للنافذة لا قبله
+        QTimer.singleShot(self.warm_up_delay, self.chat_widget.warm_up)
+
     def initUI(self):
         self.setWindowTitle('AI-Powered Mind Map Creator')
         self.setGeometry(100, 100, 1500, 800)
@@ -46,7 +180,13 @@ class MindMapWindow(QMainWindow):
         
         # Chat widget
         self.chat_widget = ChatWidget()
+        self.chat_widget.mindMapStarted.connect(self.scene.begin_streaming)
+        self.chat_widget.branchGenerated.connect(self.scene.add_streamed_branch)
+        self.chat_widget.generationStopped.connect(self.scene.abort_streaming)
         self.chat_widget.mindMapGenerated.connect(self.create_mind_map)
+        self.chat_widget.outlineGenerated.connect(self.create_outline)
+        self.chat_widget.branchExpanded.connect(self.on_branch_expanded)
+        self.scene.expandRequested.connect(self.chat_widget.expand_branch)
         splitter.addWidget(self.chat_widget)
         
         splitter.setSizes([int(self.width() * 0.7), int(self.width() * 0.3)])
@@ -59,21 +199,50 @@ class MindMapWindow(QMainWindow):
                 data = json.loads(json_str)
             else:
                 data = json_str
-            self.scene.create_from_json(data)
+            if self.scene.streaming:
+                self.scene.finish_streaming(data)
+            else:
+                self.scene.create_from_json(data)
+            self.document_path = None
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to create mind map: {str(e)}")
             
+    def create_outline(self, data):
+        try:
+            self.scene.create_from_json(data, expandable=True)
+            self.document_path = None
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to create mind map: {str(e)}")
+            return
+        # الفروع الأولى هي الأرجح أن تُفتح أولاً
+        center = data['center']
+        self.chat_widget.prefetch_expansions(
+            [(center, branch['text']) for branch in data.get('branches', [])[:self.prefetch_count]
+             if not branch.get('children')])
+
+    def on_branch_expanded(self, path, children):
+        self.scene.apply_expansion(path, children)
+        self.chat_widget.prefetch_expansions(
+            [tuple(path) + (child['text'],) for child in children[:self.prefetch_count]
+             if not child.get('children')])
+
     def createToolBar(self):
         toolbar = self.addToolBar('Tools')
         toolbar.setMovable(False)
         
         # Add actions
         actions = [
+            ('Open', 'Ctrl+O', self.openDocument),
+            ('Save', 'Ctrl+S', self.saveDocument),
+            ('Save As', 'Ctrl+Shift+S', self.saveDocumentAs),
             ('Zoom In', 'Ctrl++', lambda: self.view.scale(1.1, 1.1)),
             ('Zoom Out', 'Ctrl+-', lambda: self.view.scale(0.9, 0.9)),
             ('Reset Zoom', 'Ctrl+0', lambda: self.view.setTransform(QTransform())),
+            ('Collapse All', 'Ctrl+[', lambda: self.scene.collapse_all()),
+            ('Expand All', 'Ctrl+]', lambda: self.scene.expand_all()),
             ('Export as Image', 'Ctrl+E', self.exportImage),
-            ('Clear', 'Ctrl+N', lambda: self.scene.clear())
+            ('Export Trace', 'Ctrl+Shift+T', self.exportTrace),
+            ('Clear', 'Ctrl+N', self.clearMindMap)
         ]
         
         for name, shortcut, callback in actions:
@@ -81,17 +250,165 @@ class MindMapWindow(QMainWindow):
             action.setShortcut(shortcut)
             action.triggered.connect(callback)
             toolbar.addAction(action)
+
+        # طبقة الأداء: عدد الإطارات ومدة الإطار وعدد العناصر
+        overlay = QAction('Performance', self)
+        overlay.setShortcut('F12')
+        overlay.setCheckable(True)
+        overlay.toggled.connect(self.view.set_overlay)
+        toolbar.addAction(overlay)
+
+        # اختيار نمط التخطيط
+        toolbar.addSeparator()
+        toolbar.addWidget(QLabel(' Layout: '))
+        self.layout_combo = QComboBox()
+        for name, mode in (('Radial', 'radial'), ('Balanced', 'balanced'),
+                           ('Tidy Tree', 'tidy'), ('Classic', 'classic')):
+            self.layout_combo.addItem(name, mode)
+        self.layout_combo.setCurrentIndex(self.layout_combo.findData(self.scene.layout_mode))
+        self.layout_combo.currentIndexChanged.connect(
+            lambda: self.scene.set_layout(self.layout_combo.currentData()))
+        toolbar.addWidget(self.layout_combo)
+
+        # البحث في نصوص العقد، Enter ينتقل إلى النتيجة التالية
+        toolbar.addSeparator()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search nodes (Ctrl+F)")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.setMaximumWidth(260)
+        self.search_model = QStringListModel(self)
+        completer = QCompleter(self.search_model, self)
+        completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        completer.activated[QModelIndex].connect(lambda index: self.showSearchResult(index.row()))
+        self.search_input.setCompleter(completer)
+        self.search_input.textEdited.connect(self.updateSearch)
+        self.search_input.returnPressed.connect(self.nextSearchResult)
+        toolbar.addWidget(self.search_input)
+        self.search_results = []
+        self.search_position = -1
+        self._search_tree = None
+        QShortcut(QKeySequence.Find, self, activated=self.search_input.setFocus)
             
+    def updateSearch(self, query):
+        # البحث من الفهرس في كل ضغطة مفتاح، دون المرور على عناصر المشهد
+        self.search_results = self.scene.search(query) if self.scene.tree is not None else []
+        self.search_position = -1
+        self._search_tree = self.scene.tree
+        self.search_model.setStringList([self.scene.tree.text(index) for index in self.search_results])
+
+    def showSearchResult(self, position):
+        if not 0 <= position < len(self.search_results) or self._search_tree is not self.scene.tree:
+            return
+        self.search_position = position
+        self.view.center_on_node(self.search_results[position])
+
+    def nextSearchResult(self):
+        # النتائج القديمة لا تصلح إذا فُتحت خريطة أخرى أو حُذف فرع
+        if self._search_tree is not self.scene.tree:
+            self.updateSearch(self.search_input.text())
+        if self.search_results:
+            self.showSearchResult((self.search_position + 1) % len(self.search_results))
+
+    def openDocument(self):
+        fileName, _ = QFileDialog.getOpenFileName(
+            self, "Open Mind Map", "", "Mind Maps (*.mindmap *.json);;All Files (*)")
+        if not fileName:
+            return
+        try:
+            open_map(self.scene, fileName)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to open mind map: {str(e)}")
+            return
+        self.document_path = fileName
+
+    def saveDocument(self):
+        if self.document_path is None:
+            self.saveDocumentAs()
+            return
+        try:
+            save_scene(self.scene, self.document_path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save mind map: {str(e)}")
+
+    def saveDocumentAs(self):
+        fileName, selected = QFileDialog.getSaveFileName(
+            self, "Save Mind Map", "", "Mind Map (*.mindmap);;Mind Map JSON (*.json)")
+        if not fileName:
+            return
+        if not QFileInfo(fileName).suffix():
+            fileName += selected[selected.index('*') + 1:-1]
+        self.document_path = fileName
+        self.saveDocument()
+
+    def clearMindMap(self):
+        self.scene.clear()
+        self.document_path = None
+        self.journal.discard()
+
+    def offerRecovery(self):
+        answer = QMessageBox.question(
+            self, "Recover Mind Map",
+            "The previous session did not close normally. Recover its unsaved mind map?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        if answer != QMessageBox.Yes:
+            self.journal.discard()
+            return
+        try:
+            recovered = recover(self.journal.directory)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to recover mind map: {str(e)}")
+            self.journal.discard()
+            return
+        if recovered is None:
+            return
+        tree, expandable, _ = recovered
+        self.scene.load_tree(tree, expandable)
+
+    def onJournalFailed(self, message):
+        self.statusBar().showMessage(f"Autosave disabled: {message}")
+        # النافذة تظهر مرة واحدة، وشريط الحالة يبقى يعرض آخر خطأ
+        if not self._journal_warned:
+            self._journal_warned = True
+            QMessageBox.warning(self, "Autosave disabled",
+                                f"Edits can no longer be saved for crash recovery:\n{message}")
+
+    def closeEvent(self, event):
+        # الإغلاق الطبيعي لا يحتاج استعادة
+        self.journal.close(discard=True)
+        super().closeEvent(event)
+
     def exportImage(self):
-        fileName, _ = QFileDialog.getSaveFileName(self, "Export as Image", "", "PNG Files (*.png)")
-        if fileName:
-            rect = self.scene.itemsBoundingRect()
-            image = QImage(rect.size().toSize(), QImage.Format_ARGB32)
-            image.fill(Qt.white)
-            
-            painter = QPainter(image)
-            painter.setRenderHint(QPainter.Antialiasing)
-            self.scene.render(painter, QRectF(image.rect()), rect)
-            painter.end()
-            
-            image.save(fileName)
\ No newline at end of file
+        fileName, selected = QFileDialog.getSaveFileName(
+            self, "Export as Image", "",
+            "PNG Files (*.png);;SVG Files (*.svg);;PDF Files (*.pdf);;Deep Zoom Tiles (*.dzi)")
+        if not fileName:
+            return
+        # إضافة الامتداد من المرشح المختار إذا لم يكتبه المستخدم
+        if not QFileInfo(fileName).suffix():
+            fileName += selected[selected.index('*') + 1:-1]
+        fmt = QFileInfo(fileName).suffix().lower()
+        options = {}
+        if fmt in EXPORT_OPTIONS:
+            dialog = ExportOptionsDialog(fmt, export_bounds(self.scene), self)
+            if dialog.exec_() != QDialog.Accepted:
+                return
+            options = dialog.options()
+        try:
+            # الخيارات التي لا تخص الصيغة المختارة تُتجاهل في export_scene
+            export_scene(self.scene, fileName, **options)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to export: {str(e)}")
+
+    def exportTrace(self):
+        if not profiler.events:
+            QMessageBox.information(self, "Export Trace",
+                                    "No trace recorded yet. Turn on Performance (F12) first.")
+            return
+        fileName, _ = QFileDialog.getSaveFileName(
+            self, "Export Trace", "", "Chrome Trace (*.json);;All Files (*)")
+        if not fileName:
+            return
+        try:
+            profiler.export_chrome_trace(fileName)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to export trace: {str(e)}")
\ No newline at end of file
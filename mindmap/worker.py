@@ -0,0 +1,112 @@
+from PyQt5.QtCore import *
+import json
+from .json_parser import JSONParser, IncrementalJSONParser
+
+class GenerationSignals(QObject):
+    progress = pyqtSignal(str)
+    centerReady = pyqtSignal(str)
+    branchReady = pyqtSignal(dict)
+    finished = pyqtSignal(str, dict)
+    failed = pyqtSignal(str)
+
+class GenerationWorker(QRunnable):
+    def __init__(self, ai_chat, topic, stream=False, refresh=False, outline=False):
+        super().__init__()
+        self.ai_chat = ai_chat
+        self.topic = topic
+        self.stream = stream
+        self.refresh = refresh
+        self.outline = outline
+        self.kind = 'outline' if outline else 'full'
+        self.signals = GenerationSignals()
+        # تقرير إصلاح الاستجابة، None للنتائج من الذاكرة المؤقتة
+        self.report = None
+        self._cancelled = False
+
+    def cancel(self):
+        # لا يمكن قطع طلب الشبكة الجاري، لذا نتجاهل نتيجته عند وصولها
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        try:
+            if not self.refresh:
+                data = self.ai_chat.cached_tree(self.topic, self.kind)
+                if data is not None:
+                    if not self._cancelled:
+                        self.signals.finished.emit(json.dumps(data, ensure_ascii=False, indent=2), data)
+                    return
+
+            self.signals.progress.emit("Waiting for the AI response...")
+            if self.stream:
+                response = self.run_streaming()
+                if self._cancelled:
+                    return
+                self.signals.progress.emit("Parsing the response...")
+                data, self.report = JSONParser.parse_response(response)
+                if not self.report.usable:
+                    raise ValueError("No usable mind map found in response")
+            else:
+                response, data, self.report = self.ai_chat.generate_tree(self.topic, self.outline)
+            if self._cancelled:
+                return
+
+            self.ai_chat.store_tree(self.topic, data, self.kind)
+            if self._cancelled:
+                return
+
+            self.signals.finished.emit(response, data)
+        except Exception as e:
+            if not self._cancelled:
+                self.signals.failed.emit(str(e))
+
+
+    def run_streaming(self):
+        parser = IncrementalJSONParser()
+        chunks = []
+        for chunk in self.ai_chat.stream_mindmap(self.topic, self.outline):
+            if self._cancelled:
+                break
+            chunks.append(chunk)
+            for event, value in parser.feed(chunk):
+                if event == 'center':
+                    self.signals.centerReady.emit(value)
+                else:
+                    self.signals.progress.emit(f"Received {len(parser.branches)} branches...")
+                    self.signals.branchReady.emit(value)
+        return ''.join(chunks)
+
+class ExpansionSignals(QObject):
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, str)
+
+class ExpansionWorker(QRunnable):
+    # طلب أبناء فرع واحد، يُستخدم للتوسيع عند الطلب وللجلب المسبق
+    def __init__(self, ai_chat, path):
+        super().__init__()
+        self.ai_chat = ai_chat
+        self.path = tuple(path)
+        self.signals = ExpansionSignals()
+
+    def run(self):
+        try:
+            children = self.ai_chat.expand_branch(self.path)
+        except Exception as e:
+            self.signals.failed.emit(self.path, str(e))
+        else:
+            self.signals.finished.emit(self.path, children)
+
+class ModelWarmUp(QRunnable):
+    # إنشاء AIChat وتحميل مكتبة النموذج في الخلفية بعد ظهور النافذة حتى لا ينتظرها أول طلب
+    def __init__(self, load_chat):
+        super().__init__()
+        self.load_chat = load_chat
+
+    def run(self):
+        try:
+            self.load_chat().ensure_model()
+        except Exception:
+            # الخطأ يظهر للمستخدم عند أول طلب فعلي
+            pass
@@ -0,0 +1,33 @@
+import pytest
+
+from mindmap.ai_chat import AIChat
+from mindmap.backends import FakeBackend, synthetic_tree
+from mindmap.json_parser import JSONParser
+from mindmap.tree import MindMapTree
+
+
+@pytest.mark.parametrize('nodes, depth, fan_out', [
+    (1, 3, 5), (13, 3, 8), (300, 3, 8), (585, 3, 8), (1000, 12, 4), (20000, 4, 40)])
+def test_synthetic_tree_has_exact_size(nodes, depth, fan_out):
+    tree = MindMapTree.from_json(synthetic_tree(nodes=nodes, depth=depth, fan_out=fan_out, seed=1))
+    assert len(tree) == nodes
+    assert int(tree.level[:len(tree)].max()) <= depth
+    assert max(len(tree.children(index)) for index in range(len(tree))) <= fan_out
+
+
+def test_synthetic_tree_is_deterministic():
+    assert synthetic_tree(300, 3, 8, seed=2) == synthetic_tree(300, 3, 8, seed=2)
+
+
+def test_synthetic_tree_rejects_impossible_size():
+    with pytest.raises(ValueError):
+        synthetic_tree(nodes=586, depth=3, fan_out=8)
+
+
+def test_fake_backend_answers_expand_prompts():
+    # بناء الطلب فقط، دون إعدادات أو ذاكرة مؤقتة في مجلد المستخدم
+    prompt = AIChat.__new__(AIChat).build_expand_prompt(('Topic', 'Topic 1'))
+    response = FakeBackend(fan_out=6).generate(prompt).text
+    children = JSONParser.extract_children(response)
+    assert 1 <= len(children) <= 6
+    assert all(child['text'].startswith('Topic 1 ') for child in children)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from mindmap.backends import synthetic_tree
+from mindmap.layout import radial_layout, relax_positions
+from mindmap.tree import MindMapTree
+
+
+def exact_relax(positions, min_distance, damping=0.6, iterations=50):
+    # التنافر الزوجي الكامل دون شبكة، مرجع للمقارنة
+    positions = np.array(positions, dtype=np.float64)
+    for _ in range(iterations):
+        delta = positions[None, :, :] - positions[:, None, :]
+        distance = np.hypot(delta[..., 0], delta[..., 1])
+        close = distance < min_distance
+        np.fill_diagonal(close, False)
+        if not close.any():
+            break
+        unit = np.zeros_like(delta)
+        unit[..., 0] = 1.0
+        nonzero = distance > 0
+        unit[nonzero] = delta[nonzero] / distance[nonzero, None]
+        force = -np.where(close, min_distance - distance, 0)[..., None] * unit * damping
+        total = force.sum(axis=1)
+        total[0] = 0
+        positions += total
+    return positions
+
+
+def classic_positions(nodes, depth, fan_out):
+    tree = MindMapTree.from_json(synthetic_tree(nodes=nodes, depth=depth, fan_out=fan_out, seed=0))
+    radial_layout(tree, 500, 400, 60)
+    return tree.positions[:len(tree)].copy()
+
+
+@pytest.mark.parametrize('nodes, depth, fan_out', [(200, 3, 8), (1000, 3, 40), (1000, 12, 4)])
+def test_relax_matches_exact_repulsion(nodes, depth, fan_out):
+    positions = classic_positions(nodes, depth, fan_out)
+    relaxed = relax_positions(positions, 250, fixed=[0])
+    expected = exact_relax(positions, 250)
+    size = relaxed.max(axis=0) - relaxed.min(axis=0)
+    expected_size = expected.max(axis=0) - expected.min(axis=0)
+    np.testing.assert_allclose(size, expected_size, rtol=0.02)
+
+
+def test_relax_chunks_give_same_result():
+    positions = classic_positions(500, 4, 10)
+    whole = relax_positions(positions, 250, fixed=[0], iterations=1)
+    chunked = relax_positions(positions, 250, fixed=[0], iterations=1, max_pairs=500)
+    np.testing.assert_allclose(chunked, whole)